@@ -0,0 +1,375 @@
+import argparse
+import base64
+import gzip
+import ipaddress
+import random
+import socket
+import struct
+import time
+
+from checkdns2 import collect_unique_fields, tally_record_types
+from compactset import sorted_values
+from zonereader import read_records, write_lines
+
+TYPE_NAMES = {
+    1: 'a', 2: 'ns', 5: 'cname', 6: 'soa', 12: 'ptr', 15: 'mx', 16: 'txt', 28: 'aaaa',
+    33: 'srv', 43: 'ds', 46: 'rrsig', 47: 'nsec', 48: 'dnskey', 50: 'nsec3', 51: 'nsec3param',
+}
+CLASS_NAMES = {1: 'in', 3: 'ch', 4: 'hs'}
+
+TYPE_SOA = 6
+TYPE_IXFR = 251
+TYPE_AXFR = 252
+
+# Types whose rdata is only names, numbers, addresses, hex or base32hex, so its case carries no meaning
+CASELESS_RDATA = {'a', 'aaaa', 'ns', 'cname', 'ptr', 'mx', 'soa', 'srv', 'ds', 'nsec', 'nsec3', 'nsec3param'}
+BASE32HEX = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ234567', '0123456789abcdefghijklmnopqrstuv')
+
+class TransferError(Exception):
+    pass
+
+def type_name(code):
+    return TYPE_NAMES.get(code, f"type{code}")
+
+def encode_name(name):
+    data = b''
+    for label in name.rstrip('.').split('.'):
+        if label:
+            data += bytes([len(label)]) + label.encode('ascii')
+    return data + b'\0'
+
+def decode_name(message, offset):
+    """ Read a possibly compressed domain name; returns (name, offset after it). """
+    labels = []
+    end = None
+    jumps = 0
+    while True:
+        length = message[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = struct.unpack_from('!H', message, offset)[0] & 0x3FFF
+            jumps += 1
+            if jumps > 128:
+                raise TransferError("Compression loop in domain name")
+            continue
+        offset += 1
+        if length == 0:
+            break
+        label = message[offset:offset + length]
+        labels.append(''.join(chr(c) if 0x21 <= c <= 0x7E and c not in b'.\\' else f"\\{c:03d}" for c in label.lower()))
+        offset += length
+    return '.'.join(labels) + '.', end if end is not None else offset
+
+def _type_bitmap(data):
+    types = []
+    offset = 0
+    while offset + 2 <= len(data):
+        window, length = data[offset], data[offset + 1]
+        for i, byte in enumerate(data[offset + 2:offset + 2 + length]):
+            for bit in range(8):
+                if byte & (0x80 >> bit):
+                    types.append(type_name(window * 256 + i * 8 + bit))
+        offset += 2 + length
+    return types
+
+def _timestamp(value):
+    return time.strftime('%Y%m%d%H%M%S', time.gmtime(value))
+
+def render_rdata(message, rtype, offset, length):
+    """ Render rdata in zone-file presentation format, as a list of fields. """
+    rdata = message[offset:offset + length]
+    if rtype == 1:
+        return [str(ipaddress.IPv4Address(rdata))]
+    if rtype == 28:
+        return [str(ipaddress.IPv6Address(rdata))]
+    if rtype in (2, 5, 12):
+        return [decode_name(message, offset)[0]]
+    if rtype == 15:
+        return [str(struct.unpack_from('!H', rdata)[0]), decode_name(message, offset + 2)[0]]
+    if rtype == 6:
+        mname, position = decode_name(message, offset)
+        rname, position = decode_name(message, position)
+        return [mname, rname] + [str(value) for value in struct.unpack_from('!5I', message, position)]
+    if rtype == 16:
+        strings = []
+        position = 0
+        while position < len(rdata):
+            text = rdata[position + 1:position + 1 + rdata[position]]
+            strings.append('"' + text.decode('latin-1').replace('\\', '\\\\').replace('"', '\\"') + '"')
+            position += 1 + rdata[position]
+        return strings
+    if rtype == 43:
+        key_tag, algorithm, digest_type = struct.unpack_from('!HBB', rdata)
+        return [str(key_tag), str(algorithm), str(digest_type), rdata[4:].hex().upper()]
+    if rtype == 48:
+        flags, protocol, algorithm = struct.unpack_from('!HBB', rdata)
+        return [str(flags), str(protocol), str(algorithm), base64.b64encode(rdata[4:]).decode()]
+    if rtype == 46:
+        covered, algorithm, labels, original_ttl, expiration, inception, key_tag = struct.unpack_from('!HBBIIIH', rdata)
+        signer, position = decode_name(message, offset + 18)
+        return [type_name(covered), str(algorithm), str(labels), str(original_ttl), _timestamp(expiration),
+                _timestamp(inception), str(key_tag), signer, base64.b64encode(message[position:offset + length]).decode()]
+    if rtype == 47:
+        next_name, position = decode_name(message, offset)
+        return [next_name] + _type_bitmap(message[position:offset + length])
+    if rtype in (50, 51):
+        algorithm, flags, iterations, salt_length = struct.unpack_from('!BBHB', rdata)
+        salt = rdata[5:5 + salt_length].hex().upper() or '-'
+        fields = [str(algorithm), str(flags), str(iterations), salt]
+        if rtype == 50:
+            position = 5 + salt_length
+            hash_length = rdata[position]
+            next_hash = rdata[position + 1:position + 1 + hash_length]
+            fields.append(base64.b32encode(next_hash).decode().rstrip('=').translate(BASE32HEX))
+            fields.extend(_type_bitmap(rdata[position + 1 + hash_length:]))
+        return fields
+    # RFC 3597 generic encoding for everything else
+    return ['\\#', str(length)] + ([rdata.hex().upper()] if length else [])
+
+def parse_message(message, query_id):
+    """ Yield (owner, ttl, class, type code, rdata fields) for the answer records of one response. """
+    if len(message) < 12:
+        raise TransferError("Response shorter than a DNS header")
+    message_id, flags, qdcount, ancount = struct.unpack_from('!HHHH', message)
+    if message_id != query_id:
+        raise TransferError("Response ID does not match the query")
+    rcode = flags & 0xF
+    if rcode:
+        raise TransferError(f"Server refused the transfer (rcode {rcode})")
+
+    offset = 12
+    try:
+        for _ in range(qdcount):
+            offset = decode_name(message, offset)[1] + 4
+        for _ in range(ancount):
+            owner, offset = decode_name(message, offset)
+            rtype, rclass, ttl, length = struct.unpack_from('!HHIH', message, offset)
+            offset += 10
+            if offset + length > len(message):
+                raise TransferError("Record data runs past the end of the message")
+            yield owner, ttl, CLASS_NAMES.get(rclass, f"class{rclass}"), rtype, render_rdata(message, rtype, offset, length)
+            offset += length
+    except (IndexError, ValueError, struct.error) as e:
+        raise TransferError(f"Malformed response: {e}")
+
+def build_query(zone, qtype, serial=None):
+    query_id = random.randrange(1 << 16)
+    question = encode_name(zone) + struct.pack('!HH', qtype, 1)
+    if serial is None:
+        return query_id, struct.pack('!HHHHHH', query_id, 0, 1, 0, 0, 0) + question
+    # IXFR carries the serial we already have as an SOA in the authority section
+    soa = encode_name(zone) + struct.pack('!HHIH', TYPE_SOA, 1, 0, 22) + b'\0\0' + struct.pack('!5I', serial, 0, 0, 0, 0)
+    return query_id, struct.pack('!HHHHHH', query_id, 0, 1, 0, 1, 0) + question + soa
+
+def _read_exact(sock, count):
+    data = b''
+    while len(data) < count:
+        chunk = sock.recv(count - len(data))
+        if not chunk:
+            raise TransferError("Connection closed in the middle of the transfer")
+        data += chunk
+    return data
+
+def _serial(record):
+    return int(record[4][2])
+
+def transfer(server, zone, port=53, serial=None, timeout=30):
+    """ Yield every record of an AXFR (or of an IXFR from serial) as it arrives over TCP, SOAs included. """
+    query_id, query = build_query(zone, TYPE_AXFR if serial is None else TYPE_IXFR, serial)
+    with socket.create_connection((server, port), timeout=timeout) as sock:
+        sock.sendall(struct.pack('!H', len(query)) + query)
+        count = 0
+        # A full transfer ends at the second copy of the new SOA; an incremental
+        # one also carries it at the start of its last batch of additions
+        needed = 2
+        while True:
+            length = struct.unpack('!H', _read_exact(sock, 2))[0]
+            for record in parse_message(_read_exact(sock, length), query_id):
+                count += 1
+                if count == 1:
+                    if record[3] != TYPE_SOA:
+                        raise TransferError("Transfer does not start with an SOA record")
+                    new_serial = _serial(record)
+                    yield record
+                    if serial is not None and new_serial == serial:
+                        return
+                    seen = 1
+                    continue
+                if count == 2 and serial is not None and record[3] == TYPE_SOA and _serial(record) != new_serial:
+                    needed = 3
+                yield record
+                if record[3] == TYPE_SOA and _serial(record) == new_serial:
+                    seen += 1
+                    if seen == needed:
+                        return
+
+def normalize_line(fields):
+    """ One spelling per record so transferred records and archived lines compare equal.
+
+    Fields are tab separated and rdata single spaced. Everything but the rdata
+    is lowercased, as is rdata made of names, numbers, hex or base32hex. Hex
+    and base64 split over several fields are joined. TXT strings and base64
+    keep their case.
+    """
+    record_type = fields[3].lower()
+    rdata = fields[4:]
+    if record_type in ('ds', 'dnskey') and len(rdata) > 4:
+        rdata = rdata[:3] + [''.join(rdata[3:])]
+    elif record_type == 'rrsig' and len(rdata) > 9:
+        rdata = rdata[:8] + [''.join(rdata[8:])]
+    elif rdata[:1] == ['\\#'] and len(rdata) > 3:
+        rdata = rdata[:2] + [''.join(rdata[2:])]
+    if record_type in CASELESS_RDATA or rdata[:1] == ['\\#']:
+        rdata = [field.lower() for field in rdata]
+    elif record_type == 'rrsig':
+        rdata = [field.lower() for field in rdata[:8]] + rdata[8:]
+    return '\t'.join([fields[0].lower(), fields[1], fields[2].lower(), record_type, ' '.join(rdata)])
+
+def record_line(record):
+    owner, ttl, rclass, rtype, rdata = record
+    return normalize_line([owner, str(ttl), rclass, type_name(rtype)] + ' '.join(rdata).split())
+
+def full_lines(records):
+    """ Lines of a full transfer, leaving out the closing copy of the SOA. """
+    for count, record in enumerate(records):
+        if count and record[3] == TYPE_SOA:
+            continue
+        yield record_line(record)
+
+def ixfr(server, zone, serial, port=53, timeout=30):
+    """ Request changes since serial; returns ('current', None), ('full', lines) or ('incremental', deltas).
+
+    deltas is a list of (deleted lines, added lines) in the order they must be applied.
+    """
+    records = transfer(server, zone, port, serial, timeout)
+    first = next(records)
+    second = next(records, None)
+    if second is None:
+        return 'current', None
+    if second[3] != TYPE_SOA or _serial(second) == _serial(first):
+        # The server answered with the whole zone instead
+        def lines():
+            yield from full_lines([first, second])
+            yield from (record_line(record) for record in records if record[3] != TYPE_SOA)
+        return 'full', lines()
+
+    deltas = []
+    # Each delta is an old SOA, its deletions, a newer SOA and its additions
+    for record in [second] + list(records)[:-1]:
+        if record[3] == TYPE_SOA:
+            if not deltas or deltas[-1][1]:
+                deltas.append(([], []))
+                deltas[-1][0].append(record_line(record))
+            else:
+                deltas[-1][1].append(record_line(record))
+        elif deltas[-1][1]:
+            deltas[-1][1].append(record_line(record))
+        else:
+            deltas[-1][0].append(record_line(record))
+    return 'incremental', deltas
+
+def load_state(filename):
+    """ Read a previous snapshot into a set of normalized lines and the serial of its SOA. """
+    lines = set()
+    serial = None
+    for line, fields in read_records(filename, with_lines=True):
+        # Archives from other tools may use spaces or other spacing and case
+        lines.add(normalize_line(fields) if len(fields) >= 4 else line.strip())
+        if len(fields) >= 7 and fields[3].lower() == 'soa':
+            serial = int(fields[6])
+    return lines, serial
+
+def _soa_first(lines):
+    return sorted(lines, key=lambda line: (line.split()[3] != 'soa', line))
+
+def write_archive(path, lines):
+    with gzip.open(path, 'wt') as file:
+        for line in lines:
+            file.write(line + '\n')
+
+def print_records(file_lines):
+    added, deleted = file_lines
+    print("\nAdded Records:\n")
+    for line in sorted(added):
+        print(line)
+
+    print("\nDeleted Records:\n")
+    for line in sorted(deleted):
+        print(line)
+
+def report(records, field_num, count, compact):
+    # The same aggregators checkdns2.py runs over zone files
+    if count:
+        for record_type, total in tally_record_types(records).items():
+            print(f"{record_type}: {total}")
+    else:
+        write_lines(sorted_values(collect_unique_fields(records, field_num, compact)))
+
+def _teed(lines, tee):
+    for line in lines:
+        tee.write(line + '\n')
+        yield line
+
+def main():
+    parser = argparse.ArgumentParser(description='Transfer a zone over AXFR/IXFR and process it without an intermediate file')
+    parser.add_argument('server', help='Address of the primary to transfer from')
+    parser.add_argument('zone', help='Name of the zone to transfer')
+    parser.add_argument('-p', '--port', type=int, default=53, help='TCP port of the primary (default is 53)')
+    parser.add_argument('--timeout', type=float, default=30, help='Socket timeout in seconds (default is 30)')
+    parser.add_argument('-f', '--field', type=int, help='Field number to extract (default is 4)')
+    parser.add_argument('--count', action='store_true', help='Count occurrences of DNS record types')
+    parser.add_argument('--compact', action='store_true', help='Store unique values in a compact arena-backed set to save memory')
+    parser.add_argument('--previous', help='Gzipped snapshot of the previous transfer; prints the records added and deleted since')
+    parser.add_argument('--ixfr', action='store_true', help='Request only the changes since --previous and apply them to it')
+    parser.add_argument('--tee', help='Also write the transferred zone to this gzipped file')
+    args = parser.parse_args()
+
+    field_num = args.field if args.field else 4
+    if args.ixfr and not args.previous:
+        print("Error: --ixfr needs the --previous snapshot to apply changes to.")
+        return
+
+    try:
+        if not args.previous:
+            lines = full_lines(transfer(args.server, args.zone, args.port, timeout=args.timeout))
+            if args.tee:
+                with gzip.open(args.tee, 'wt') as tee:
+                    report((line.split() for line in _teed(lines, tee)), field_num, args.count, args.compact)
+            else:
+                report((line.split() for line in lines), field_num, args.count, args.compact)
+            return
+
+        state, serial = load_state(args.previous)
+        if args.ixfr and serial is not None:
+            kind, result = ixfr(args.server, args.zone, serial, args.port, args.timeout)
+        else:
+            kind, result = 'full', full_lines(transfer(args.server, args.zone, args.port, timeout=args.timeout))
+
+        if kind == 'current':
+            print(f"\n{args.zone} is unchanged at serial {serial}.")
+            new_state = state
+            added, deleted = set(), set()
+        elif kind == 'incremental':
+            new_state = set(state)
+            for delta_deleted, delta_added in result:
+                new_state.difference_update(delta_deleted)
+                new_state.update(delta_added)
+            added, deleted = new_state - state, state - new_state
+        else:
+            new_state = set(result)
+            added, deleted = new_state - state, state - new_state
+
+        if kind != 'current':
+            print_records((added, deleted))
+        print()
+        report((line.split() for line in new_state), field_num, args.count, args.compact)
+        if args.tee:
+            write_archive(args.tee, _soa_first(new_state))
+    except FileNotFoundError:
+        print(f"Error: File '{args.previous}' not found.")
+    except (OSError, TransferError) as e:
+        print(f"Error: Transfer of {args.zone} from {args.server} failed: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,17 @@
 import argparse
-import gzip
 
-def extract_unique_fields(filename, field_num):
-    field_values = set()
+import sampling
+from compactset import CompactSet, sorted_values
+from zonereader import read_records, write_lines
 
-    try:
-        with gzip.open(filename, 'rt') as file:
-            for line in file:
-                if line.startswith(';') or line.strip() == '':
-                    continue
-                
-                fields = line.split()
-                if len(fields) >= field_num:
-                    field_values.add(fields[field_num - 1])
-
-        # Print the unique sorted values
-        for value in sorted(field_values):
-            print(value)
-
-    except FileNotFoundError:
-        print(f"Error: File '{filename}' not found.")
+def collect_unique_fields(records, field_num, compact=False):
+    field_values = CompactSet() if compact else set()
+    for fields in records:
+        if len(fields) >= field_num:
+            field_values.add(fields[field_num - 1])
+    return field_values
 
-def count_record_types(filename):
+def tally_record_types(records):
     record_types = {
         'a': 0,
         'aaaa': 0,
@@ -34,15 +24,24 @@ def count_record_types(filename):
         'soa': 0
     }
 
+    for fields in records:
+        if len(fields) >= 4 and fields[3] in record_types:
+            record_types[fields[3]] += 1
+    return record_types
+
+def extract_unique_fields(filename, field_num, compact=False):
+    try:
+        field_values = collect_unique_fields(read_records(filename), field_num, compact)
+
+        # Print the unique sorted values
+        write_lines(sorted_values(field_values))
+
+    except FileNotFoundError:
+        print(f"Error: File '{filename}' not found.")
+
+def count_record_types(filename):
     try:
-        with gzip.open(filename, 'rt') as file:
-            for line in file:
-                if line.startswith(';') or line.strip() == '':
-                    continue
-                
-                fields = line.split()
-                if len(fields) >= 4 and fields[3] in record_types:
-                    record_types[fields[3]] += 1
+        record_types = tally_record_types(read_records(filename))
 
         # Print the count of each record type
         for record_type, count in record_types.items():
@@ -51,20 +50,50 @@ def count_record_types(filename):
     except FileNotFoundError:
         print(f"Error: File '{filename}' not found.")
 
+def estimate_from_sample(filename, fraction, field_num, count, seed=None):
+    try:
+        blocks, total_blocks, total_bytes = sampling.gzip_blocks(filename, fraction, seed)
+    except FileNotFoundError as e:
+        if e.filename == filename:
+            print(f"Error: File '{filename}' not found.")
+        else:
+            print(f"Error: '{filename}' has no index; build one with gzindex.py --build to sample it.")
+        return
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+
+    if count:
+        record_types = list(tally_record_types([]))
+        estimates = sampling.estimate_counts(blocks, total_blocks, total_bytes,
+                                             lambda fields: fields[3] if len(fields) >= 4 else None, record_types)
+        sampling.print_estimates(estimates, record_types)
+    else:
+        # Distribution of the most common values of the field
+        estimates = sampling.estimate_counts(blocks, total_blocks, total_bytes,
+                                             lambda fields: fields[field_num - 1] if len(fields) >= field_num else None)
+        sampling.print_estimates(estimates, limit=20)
+    sampling.print_coverage(blocks, total_blocks, total_bytes)
+
 def main():
     parser = argparse.ArgumentParser(description='Process a gzipped zone file')
     parser.add_argument('filename', help='Path to the gzipped zone file')
     parser.add_argument('-f', '--field', type=int, help='Field number to extract (default is 4)')
     parser.add_argument('--count', action='store_true', help='Count occurrences of DNS record types')
+    parser.add_argument('--sample', type=float, metavar='FRACTION', help='Estimate from this fraction of the file, read at random access points of its gzindex')
+    parser.add_argument('--seed', type=int, help='Random seed for choosing the sampled blocks')
+    parser.add_argument('--compact', action='store_true', help='Store unique values in a compact arena-backed set to save memory')
     args = parser.parse_args()
 
     filename = args.filename
     field_num = args.field if args.field else 4
 
-    if args.count:
+    if args.sample:
+        estimate_from_sample(filename, args.sample, field_num, args.count, args.seed)
+    elif args.count:
         count_record_types(filename)
     else:
-        extract_unique_fields(filename, field_num)
+        extract_unique_fields(filename, field_num, args.compact)
 
 if __name__ == "__main__":
     main()
@@ -1,47 +1,31 @@
 import argparse
-import gzip
 
-def extract_unique_fields(filename, field_num):
-    field_values = set()
+from compactset import CompactSet, sorted_values
+from zonereader import read_records, write_lines
+
+RECORD_TYPES = ('a', 'aaaa', 'dnskey', 'ds', 'ns', 'nsec3', 'nsec3param', 'rrsig', 'soa')
+
+def extract_unique_fields(filename, field_num, compact=False):
+    field_values = CompactSet() if compact else set()
 
     try:
-        with gzip.open(filename, 'rt') as file:
-            for line in file:
-                if line.startswith(';') or line.strip() == '':
-                    continue
-                
-                fields = line.split()
-                if len(fields) >= field_num:
-                    field_values.add(fields[field_num - 1])
+        for fields in read_records(filename):
+            if len(fields) >= field_num:
+                field_values.add(fields[field_num - 1])
 
         return field_values
 
     except FileNotFoundError:
         print(f"Error: File '{filename}' not found.")
-        return set()
+        return CompactSet() if compact else set()
 
 def count_record_types(filename):
-    record_types = {
-        'a': 0,
-        'aaaa': 0,
-        'dnskey': 0,
-        'ds': 0,
-        'ns': 0,
-        'nsec3': 0,
-        'nsec3param': 0,
-        'rrsig': 0,
-        'soa': 0
-    }
+    record_types = dict.fromkeys(RECORD_TYPES, 0)
 
     try:
-        with gzip.open(filename, 'rt') as file:
-            for line in file:
-                if line.startswith(';') or line.strip() == '':
-                    continue
-                
-                fields = line.split()
-                if len(fields) >= 4 and fields[3] in record_types:
-                    record_types[fields[3]] += 1
+        for fields in read_records(filename):
+            if len(fields) >= 4 and fields[3] in record_types:
+                record_types[fields[3]] += 1
 
         return record_types
 
@@ -49,13 +33,28 @@ def count_record_types(filename):
         print(f"Error: File '{filename}' not found.")
         return {}
 
-def compare_files(file1, file2, field_num):
-    # Extract unique field values and record type counts for both files
-    field_values1 = extract_unique_fields(file1, field_num)
-    field_values2 = extract_unique_fields(file2, field_num)
+def scan_file(filename, field_num, compact=False):
+    """ One pass over a zone collecting its unique field values and its record type counts. """
+    field_values = CompactSet() if compact else set()
+    record_types = dict.fromkeys(RECORD_TYPES, 0)
+
+    try:
+        for fields in read_records(filename):
+            if len(fields) >= field_num:
+                field_values.add(fields[field_num - 1])
+            if len(fields) >= 4 and fields[3] in record_types:
+                record_types[fields[3]] += 1
+
+        return field_values, record_types
+
+    except FileNotFoundError:
+        print(f"Error: File '{filename}' not found.")
+        return CompactSet() if compact else set(), {}
 
-    record_types1 = count_record_types(file1)
-    record_types2 = count_record_types(file2)
+def compare_files(file1, file2, field_num, compact=False):
+    # Extract unique field values and record type counts for both files, one pass each
+    field_values1, record_types1 = scan_file(file1, field_num, compact)
+    field_values2, record_types2 = scan_file(file2, field_num, compact)
 
     # Identify differences
     unique_in_file1 = field_values1 - field_values2
@@ -68,12 +67,10 @@ def compare_files(file1, file2, field_num):
 
     # Print results
     print(f"Unique field values in {file1} but not in {file2}:")
-    for value in sorted(unique_in_file1):
-        print(value)
+    write_lines(sorted_values(unique_in_file1))
 
     print(f"\nUnique field values in {file2} but not in {file1}:")
-    for value in sorted(unique_in_file2):
-        print(value)
+    write_lines(sorted_values(unique_in_file2))
 
     print("\nDifferences in record type counts:")
     for record_type, counts in diff_record_types.items():
@@ -84,13 +81,14 @@ def main():
     parser.add_argument('file1', help='Path to the first gzipped zone file')
     parser.add_argument('file2', help='Path to the second gzipped zone file')
     parser.add_argument('-f', '--field', type=int, help='Field number to extract (default is 4)')
+    parser.add_argument('--compact', action='store_true', help='Store unique values in a compact arena-backed set to save memory')
     args = parser.parse_args()
 
     file1 = args.file1
     file2 = args.file2
     field_num = args.field if args.field else 4
 
-    compare_files(file1, file2, field_num)
+    compare_files(file1, file2, field_num, args.compact)
 
 if __name__ == "__main__":
     main()
@@ -1,48 +1,40 @@
 import argparse
 import os
-import gzip
+import zlib
 
-def extract_unique_fields(filename, field_num):
-    field_values = set()
+from compactset import CompactSet, sorted_values
+from preflight import preflight_pair
+from zonereader import cancel_prefetch, prefetch, read_records, write_lines
+
+RECORD_TYPES = ('a', 'aaaa', 'dnskey', 'ds', 'ns', 'nsec3', 'nsec3param', 'rrsig', 'soa')
+# Records aggregated from one file of a pair before switching to the other
+SCAN_BATCH = 10000
+
+def extract_unique_fields(filename, field_num, compact=False):
+    field_values = CompactSet() if compact else set()
 
     try:
-        with gzip.open(filename, 'rt') as file:
-            for line in file:
-                if line.startswith(';') or line.strip() == '':
-                    continue
-                
-                fields = line.split()
-                if len(fields) >= field_num:
-                    field_values.add(fields[field_num - 1])
+        for fields in read_records(filename):
+            if len(fields) >= field_num:
+                field_values.add(fields[field_num - 1])
 
         return field_values
 
     except FileNotFoundError:
         print(f"Error: File '{filename}' not found.")
-        return set()
+        return CompactSet() if compact else set()
+    except (EOFError, zlib.error) as e:
+        # zlib checks each member's CRC and length as part of this pass
+        print(f"Error: File '{filename}' is truncated or corrupt ({e}).")
+        return None
 
 def count_record_types(filename):
-    record_types = {
-        'a': 0,
-        'aaaa': 0,
-        'dnskey': 0,
-        'ds': 0,
-        'ns': 0,
-        'nsec3': 0,
-        'nsec3param': 0,
-        'rrsig': 0,
-        'soa': 0
-    }
+    record_types = dict.fromkeys(RECORD_TYPES, 0)
 
     try:
-        with gzip.open(filename, 'rt') as file:
-            for line in file:
-                if line.startswith(';') or line.strip() == '':
-                    continue
-                
-                fields = line.split()
-                if len(fields) >= 4 and fields[3] in record_types:
-                    record_types[fields[3]] += 1
+        for fields in read_records(filename):
+            if len(fields) >= 4 and fields[3] in record_types:
+                record_types[fields[3]] += 1
 
         return record_types
 
@@ -50,13 +42,68 @@ def count_record_types(filename):
         print(f"Error: File '{filename}' not found.")
         return {}
 
-def compare_files(file1, file2, field_num):
-    # Extract unique field values and record type counts for both files
-    field_values1 = extract_unique_fields(file1, field_num)
-    field_values2 = extract_unique_fields(file2, field_num)
+def report_preflight(file1, file2):
+    """ Run the cheap checks on a pair and report it; returns True when the full comparison is still needed. """
+    status, detail = preflight_pair(file1, file2)
+    if status == 'unchanged':
+        print(f"Unchanged: {file1} and {file2} have SOA serial {detail} and identical contents")
+    elif status == 'corrupt':
+        print(f"Error: {detail}")
+    return status == 'changed'
+
+def _scan_records(filename, field_num, field_values, record_types):
+    # Aggregates one file, pausing after every SCAN_BATCH records so that
+    # both files of a pair can be scanned side by side
+    for count, fields in enumerate(read_records(filename), 1):
+        if len(fields) >= field_num:
+            field_values.add(fields[field_num - 1])
+        if len(fields) >= 4 and fields[3] in record_types:
+            record_types[fields[3]] += 1
+        if count % SCAN_BATCH == 0:
+            yield
+
+def scan_pair(file1, file2, field_num, compact=False):
+    """ Collect the unique field values and record type counts of both files in one interleaved pass.
+
+    Returns a (field_values, record_types) pair per file, or None when either
+    file turns out to be truncated or corrupt. zlib only finds that out where
+    the damage is, so both files are read side by side and the pair is given
+    up at the first failure, rather than after one file is fully aggregated.
+    """
+    results = [(CompactSet() if compact else set(), dict.fromkeys(RECORD_TYPES, 0)) for _ in range(2)]
+    scans = [(i, filename, _scan_records(filename, field_num, *results[i])) for i, filename in enumerate((file1, file2))]
 
-    record_types1 = count_record_types(file1)
-    record_types2 = count_record_types(file2)
+    try:
+        while scans:
+            for scan in list(scans):
+                i, filename, records = scan
+                try:
+                    next(records)
+                except StopIteration:
+                    scans.remove(scan)
+                except FileNotFoundError:
+                    print(f"Error: File '{filename}' not found.")
+                    results[i] = (CompactSet() if compact else set(), {})
+                    scans.remove(scan)
+                except (EOFError, zlib.error) as e:
+                    # zlib checks each member's CRC and length as part of this pass
+                    print(f"Error: File '{filename}' is truncated or corrupt ({e}).")
+                    return None
+    finally:
+        for _, _, records in scans:
+            records.close()
+
+    return results
+
+def compare_files(file1, file2, field_num, compact=False, preflight=True):
+    if preflight and not report_preflight(file1, file2):
+        return
+
+    # Extract unique field values and record type counts for both files in one pass
+    scanned = scan_pair(file1, file2, field_num, compact)
+    if scanned is None:
+        return
+    (field_values1, record_types1), (field_values2, record_types2) = scanned
 
     # Identify differences
     unique_in_file1 = field_values1 - field_values2
@@ -69,27 +116,47 @@ def compare_files(file1, file2, field_num):
 
     # Print results
     print(f"Unique field values in {file1} but not in {file2}:")
-    for value in sorted(unique_in_file1):
-        print(value)
+    write_lines(sorted_values(unique_in_file1))
 
     print(f"\nUnique field values in {file2} but not in {file1}:")
-    for value in sorted(unique_in_file2):
-        print(value)
+    write_lines(sorted_values(unique_in_file2))
 
     print("\nDifferences in record type counts:")
     for record_type, counts in diff_record_types.items():
         print(f"{record_type}: {file1}={counts[0]}, {file2}={counts[1]}")
 
-def process_directories(dir1, dir2, field_num):
+def process_directories(dir1, dir2, field_num, compact=False, preflight=True):
     files1 = find_gz_files(dir1)
     files2 = find_gz_files(dir2)
 
+    pairs = []
     for filename in files1:
         basename = os.path.basename(filename)
         matching_file = os.path.join(dir2, basename)
         if matching_file in files2:
+            pairs.append((filename, matching_file))
+
+    if preflight:
+        # Settle unchanged and corrupt pairs before any parsing starts
+        checked = []
+        for filename, matching_file in pairs:
+            print(f"\nChecking files: {filename} and {matching_file}")
+            if report_preflight(filename, matching_file):
+                checked.append((filename, matching_file))
+        pairs = checked
+
+    try:
+        for i, (filename, matching_file) in enumerate(pairs):
+            # Start inflating the next pair while this one is being aggregated
+            if i + 1 < len(pairs):
+                prefetch(pairs[i + 1][0])
+                prefetch(pairs[i + 1][1])
             print(f"\nComparing files: {filename} and {matching_file}\n")
-            compare_files(filename, matching_file, field_num)
+            compare_files(filename, matching_file, field_num, compact, preflight=False)
+            # A pair given up on part way, say at a corrupt file, leaves its other prefetch unread
+            cancel_prefetch(filename, matching_file)
+    finally:
+        cancel_prefetch()
 
 def find_gz_files(directory):
     gz_files = []
@@ -104,6 +171,9 @@ def main():
     parser.add_argument('dir1', help='Path to the first directory or gzipped file')
     parser.add_argument('dir2', help='Path to the second directory or gzipped file')
     parser.add_argument('-f', '--field', type=int, help='Field number to extract (default is 4)')
+    parser.add_argument('--compact', action='store_true', help='Store unique values in a compact arena-backed set to save memory')
+    parser.add_argument('--no-preflight', action='store_true', help='Always run the full comparison, even for pairs with the same SOA serial and contents. '
+                        'The preflight cannot spot a truncated file over about 4 MB; such a pair is given up when the parse reaches the damage')
     args = parser.parse_args()
 
     dir1 = args.dir1
@@ -113,10 +183,10 @@ def main():
     if os.path.isfile(dir1) and os.path.isfile(dir2):
         # Compare two individual files
         print(f"\nComparing files: {dir1} and {dir2}\n")
-        compare_files(dir1, dir2, field_num)
+        compare_files(dir1, dir2, field_num, args.compact, not args.no_preflight)
     elif os.path.isdir(dir1) and os.path.isdir(dir2):
         # Compare files with matching names in two directories
-        process_directories(dir1, dir2, field_num)
+        process_directories(dir1, dir2, field_num, args.compact, not args.no_preflight)
     else:
         print("Error: Please provide two files or two directories.")
 
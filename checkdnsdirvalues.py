@@ -1,19 +1,15 @@
 import argparse
 import os
-import gzip
+
+from zonereader import cancel_prefetch, prefetch, read_records, write_lines
 
 def extract_unique_fields(filename, field_num):
     field_values = set()
 
     try:
-        with gzip.open(filename, 'rt') as file:
-            for line in file:
-                if line.startswith(';') or line.strip() == '':
-                    continue
-                
-                fields = line.split()
-                if len(fields) >= field_num:
-                    field_values.add(fields[field_num - 1])
+        for fields in read_records(filename):
+            if len(fields) >= field_num:
+                field_values.add(fields[field_num - 1])
 
         return field_values
 
@@ -35,14 +31,9 @@ def count_record_types(filename):
     }
 
     try:
-        with gzip.open(filename, 'rt') as file:
-            for line in file:
-                if line.startswith(';') or line.strip() == '':
-                    continue
-                
-                fields = line.split()
-                if len(fields) >= 4 and fields[3] in record_types:
-                    record_types[fields[3]] += 1
+        for fields in read_records(filename):
+            if len(fields) >= 4 and fields[3] in record_types:
+                record_types[fields[3]] += 1
 
         return record_types
 
@@ -71,12 +62,10 @@ def compare_files(file1, file2, field_num):
     print(f"\nComparing files: {file1} and {file2}\n")
 
     print(f"Unique field values in {file1} but not in {file2}:")
-    for value in sorted(unique_in_file1):
-        print(f"  {value}")
+    write_lines(sorted(unique_in_file1), prefix='  ')
 
     print(f"\nUnique field values in {file2} but not in {file1}:")
-    for value in sorted(unique_in_file2):
-        print(f"  {value}")
+    write_lines(sorted(unique_in_file2), prefix='  ')
 
     print("\nDifferences in record type counts:")
     for record_type, counts in diff_record_types.items():
@@ -94,11 +83,24 @@ def process_directories(dir1, dir2, field_num):
     files1 = find_gz_files(dir1)
     files2 = find_gz_files(dir2)
 
+    pairs = []
     for filename in files1:
         basename = os.path.basename(filename)
         matching_file = os.path.join(dir2, basename)
         if matching_file in files2:
+            pairs.append((filename, matching_file))
+
+    try:
+        for i, (filename, matching_file) in enumerate(pairs):
+            # Start inflating the next pair while this one is being aggregated
+            if i + 1 < len(pairs):
+                prefetch(pairs[i + 1][0])
+                prefetch(pairs[i + 1][1])
             compare_files(filename, matching_file, field_num)
+            # A pair given up on part way, say at a corrupt file, leaves its other prefetch unread
+            cancel_prefetch(filename, matching_file)
+    finally:
+        cancel_prefetch()
 
 def find_gz_files(directory):
     gz_files = []
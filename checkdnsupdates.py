@@ -1,19 +1,15 @@
 import argparse
 import os
-import gzip
+
+from zonereader import cancel_prefetch, prefetch, read_records
 
 def extract_fields(filename, field_num):
     fields_list = []
 
     try:
-        with gzip.open(filename, 'rt') as file:
-            for line in file:
-                if line.startswith(';') or line.strip() == '':
-                    continue
-
-                fields = line.split()
-                if len(fields) >= field_num:
-                    fields_list.append(fields[field_num - 1])
+        for fields in read_records(filename):
+            if len(fields) >= field_num:
+                fields_list.append(fields[field_num - 1])
 
         return fields_list
 
@@ -35,14 +31,9 @@ def count_record_types(filename):
     }
 
     try:
-        with gzip.open(filename, 'rt') as file:
-            for line in file:
-                if line.startswith(';') or line.strip() == '':
-                    continue
-
-                fields = line.split()
-                if len(fields) >= 4 and fields[3] in record_types:
-                    record_types[fields[3]] += 1
+        for fields in read_records(filename):
+            if len(fields) >= 4 and fields[3] in record_types:
+                record_types[fields[3]] += 1
 
         return record_types
 
@@ -77,11 +68,24 @@ def process_directories(dir1, dir2, field_num, output_field):
     files1 = find_gz_files(dir1)
     files2 = find_gz_files(dir2)
 
+    pairs = []
     for filename in files1:
         basename = os.path.basename(filename)
         matching_file = os.path.join(dir2, basename)
         if matching_file in files2:
+            pairs.append((filename, matching_file))
+
+    try:
+        for i, (filename, matching_file) in enumerate(pairs):
+            # Start inflating the next pair while this one is being aggregated
+            if i + 1 < len(pairs):
+                prefetch(pairs[i + 1][0])
+                prefetch(pairs[i + 1][1])
             compare_files(filename, matching_file, field_num, output_field)
+            # A pair given up on part way, say at a corrupt file, leaves its other prefetch unread
+            cancel_prefetch(filename, matching_file)
+    finally:
+        cancel_prefetch()
 
 def find_gz_files(directory):
     gz_files = []
@@ -0,0 +1,120 @@
+import heapq
+from array import array
+
+# Entries per sorted run when iterating in order; bounds the temporary memory
+SORT_RUN = 1 << 20
+
+class CompactSet:
+    """ Deduplicating set of strings stored in one byte arena.
+
+    Values are kept UTF-8 encoded back to back in a bytearray. An
+    open-addressing table of entry numbers, plus per-entry offsets and
+    64-bit hashes, takes the place of a Python str and set slot per value,
+    which cuts the per-value overhead from 80+ bytes to about 25.
+    """
+
+    def __init__(self, values=()):
+        self._arena = bytearray()
+        # Entry i occupies arena[offsets[i]:offsets[i + 1]]
+        self._offsets = array('Q', [0])
+        self._hashes = array('q')
+        self._slots = array('i', [-1]) * 16
+        self._mask = 15
+        self.update(values)
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def _entry(self, index):
+        return bytes(self._arena[self._offsets[index]:self._offsets[index + 1]])
+
+    def _find(self, data, hashed):
+        # Returns (entry number or -1, slot where the value is or would go)
+        slots, hashes, offsets, arena = self._slots, self._hashes, self._offsets, self._arena
+        slot = hashed & self._mask
+        while True:
+            index = slots[slot]
+            if index < 0:
+                return -1, slot
+            if hashes[index] == hashed and offsets[index + 1] - offsets[index] == len(data) \
+                    and arena[offsets[index]:offsets[index + 1]] == data:
+                return index, slot
+            slot = (slot + 1) & self._mask
+
+    def _grow(self):
+        size = len(self._slots) * 2
+        self._slots = slots = array('i', [-1]) * size
+        self._mask = mask = size - 1
+        for index, hashed in enumerate(self._hashes):
+            slot = hashed & mask
+            while slots[slot] >= 0:
+                slot = (slot + 1) & mask
+            slots[slot] = index
+
+    def _insert(self, data, hashed):
+        index, slot = self._find(data, hashed)
+        if index >= 0:
+            return
+        self._slots[slot] = len(self._hashes)
+        self._hashes.append(hashed)
+        self._arena += data
+        self._offsets.append(len(self._arena))
+        # Keep the table at most 2/3 full so probe sequences stay short
+        if len(self._hashes) * 3 > len(self._slots) * 2:
+            self._grow()
+
+    def add(self, value):
+        data = value.encode('utf-8')
+        self._insert(data, hash(data))
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def __contains__(self, value):
+        data = value.encode('utf-8')
+        return self._find(data, hash(data))[0] >= 0
+
+    def __iter__(self):
+        """ Iterate over the values in insertion order. """
+        for index in range(len(self)):
+            yield self._entry(index).decode('utf-8')
+
+    def difference(self, other):
+        """ Return a new CompactSet with the values in this set that are not in other. """
+        result = CompactSet()
+        for index, hashed in enumerate(self._hashes):
+            data = self._entry(index)
+            if not isinstance(other, CompactSet):
+                if data.decode('utf-8') in other:
+                    continue
+            elif other._find(data, hashed)[0] >= 0:
+                continue
+            result._insert(data, hashed)
+        return result
+
+    __sub__ = difference
+
+    def sorted(self):
+        """ Iterate over the values in sorted order without building a list of every value.
+
+        Entries are sorted in runs of SORT_RUN and the runs merged lazily. UTF-8
+        byte order matches code point order, so this agrees with sorted() on str.
+        """
+        runs = []
+        for start in range(0, len(self), SORT_RUN):
+            stop = min(start + SORT_RUN, len(self))
+            runs.append(array('i', sorted(range(start, stop), key=self._entry)))
+
+        def run_values(run):
+            for index in run:
+                yield self._entry(index)
+
+        for data in heapq.merge(*(run_values(run) for run in runs)):
+            yield data.decode('utf-8')
+
+def sorted_values(values):
+    """ Sorted iteration for either a CompactSet or a regular set. """
+    if isinstance(values, CompactSet):
+        return values.sorted()
+    return sorted(values)
@@ -0,0 +1,173 @@
+import argparse
+import time
+
+import numpy as np
+
+from zonereader import read_records
+
+# Number of records converted to arrays at a time
+CHUNK_SIZE = 1 << 20
+
+TTL_BUCKETS = [0, 60, 300, 900, 3600, 4 * 3600, 86400, 2 * 86400, 7 * 86400, 2 ** 31]
+HOUR_BUCKETS = [-2 ** 31, 0, 6, 24, 72, 7 * 24, 14 * 24, 30 * 24, 90 * 24, 2 ** 31]
+PERCENTILES = [1, 5, 25, 50, 75, 95, 99]
+
+def _days_from_civil(year, month, day):
+    # Days since 1970-01-01 for proleptic Gregorian dates, on whole arrays
+    year = year - (month <= 2)
+    era = np.floor_divide(year, 400)
+    yoe = year - era * 400
+    mp = (month + 9) % 12
+    doy = (153 * mp + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+def parse_timestamps(values):
+    """ Convert RRSIG YYYYMMDDHHmmSS (or plain seconds) strings to epoch seconds. """
+    raw = np.array(values, dtype='S14')
+    lengths = np.char.str_len(raw)
+    digits = raw.view(np.uint8).reshape(-1, 14).astype(np.int64) - ord('0')
+
+    def number(start, end):
+        result = np.zeros(len(raw), dtype=np.int64)
+        for i in range(start, end):
+            result = result * 10 + digits[:, i]
+        return result
+
+    seconds = (_days_from_civil(number(0, 4), number(4, 6), number(6, 8)) * 86400
+               + number(8, 10) * 3600 + number(10, 12) * 60 + number(12, 14))
+    short = lengths != 14
+    if short.any():
+        seconds[short] = raw[short].astype(np.int64)
+    return seconds
+
+def _histogram(values, buckets, weights=None):
+    counts, _ = np.histogram(values, bins=buckets, weights=weights)
+    return counts.astype(np.int64)
+
+class ZoneStats:
+    def __init__(self, now, expiring_hours):
+        self.now = now
+        self.expiring_hours = expiring_hours
+        self.ttl_values = np.zeros(0, dtype=np.int64)
+        self.ttl_counts = np.zeros(0, dtype=np.int64)
+        self.validity = []
+        self.remaining = []
+        self.expiring = {}
+        self.records = 0
+        self.signatures = 0
+
+    def add_ttls(self, ttls):
+        # TTLs take few distinct values, so keep exact counts per value
+        values, counts = np.unique(np.array(ttls).astype(np.int64), return_counts=True)
+        merged = np.concatenate([self.ttl_values, values])
+        weights = np.concatenate([self.ttl_counts, counts])
+        self.ttl_values, index = np.unique(merged, return_inverse=True)
+        self.ttl_counts = np.bincount(index, weights=weights).astype(np.int64)
+        self.records += len(ttls)
+
+    def add_signatures(self, owners, covered, expirations, inceptions, signers):
+        expiration = parse_timestamps(expirations)
+        inception = parse_timestamps(inceptions)
+        self.validity.append(((expiration - inception) // 3600).astype(np.int32))
+        remaining = expiration - self.now
+        self.remaining.append((remaining // 3600).astype(np.int32))
+        self.signatures += len(owners)
+
+        for i in np.flatnonzero(remaining < self.expiring_hours * 3600):
+            self.expiring.setdefault(signers[i], []).append((int(expiration[i]), owners[i], covered[i]))
+
+    def ttl_percentiles(self):
+        if not self.records:
+            return []
+        cumulative = np.cumsum(self.ttl_counts)
+        ranks = np.ceil(np.array(PERCENTILES) / 100 * self.records).astype(np.int64)
+        return self.ttl_values[np.searchsorted(cumulative, ranks)]
+
+    def ttl_histogram(self):
+        return _histogram(self.ttl_values, TTL_BUCKETS, self.ttl_counts)
+
+def analyze_zone(filename, now, expiring_hours):
+    stats = ZoneStats(now, expiring_hours)
+    ttls = []
+    owners, covered, expirations, inceptions, signers = [], [], [], [], []
+
+    for fields in read_records(filename):
+        if len(fields) < 4 or not fields[1].isdigit():
+            continue
+        ttls.append(fields[1])
+        if fields[3] == 'rrsig' and len(fields) >= 12:
+            owners.append(fields[0])
+            covered.append(fields[4])
+            expirations.append(fields[8])
+            inceptions.append(fields[9])
+            signers.append(fields[11])
+
+        if len(ttls) >= CHUNK_SIZE:
+            stats.add_ttls(ttls)
+            ttls = []
+        if len(owners) >= CHUNK_SIZE:
+            stats.add_signatures(owners, covered, expirations, inceptions, signers)
+            owners, covered, expirations, inceptions, signers = [], [], [], [], []
+
+    if ttls:
+        stats.add_ttls(ttls)
+    if owners:
+        stats.add_signatures(owners, covered, expirations, inceptions, signers)
+    return stats
+
+def _print_histogram(title, buckets, counts, unit):
+    print(f"\n{title}:")
+    for low, high, count in zip(buckets, buckets[1:], counts):
+        print(f"  [{low}{unit}, {high}{unit}): {count}")
+
+def print_stats(filename, stats):
+    print(f"\nDNSSEC analytics for {filename}\n")
+    print(f"Records: {stats.records}")
+    print(f"Signatures: {stats.signatures}")
+
+    if stats.records:
+        print("\nTTL percentiles:")
+        for percentile, value in zip(PERCENTILES, stats.ttl_percentiles()):
+            print(f"  p{percentile}: {value}s")
+        _print_histogram("TTL histogram", TTL_BUCKETS, stats.ttl_histogram(), 's')
+
+    if stats.signatures:
+        validity = np.concatenate(stats.validity)
+        remaining = np.concatenate(stats.remaining)
+        print("\nSignature validity period percentiles:")
+        for percentile, value in zip(PERCENTILES, np.percentile(validity, PERCENTILES)):
+            print(f"  p{percentile}: {value:.0f}h")
+        print("\nSignature time to expiration percentiles:")
+        for percentile, value in zip(PERCENTILES, np.percentile(remaining, PERCENTILES)):
+            print(f"  p{percentile}: {value:.0f}h")
+        _print_histogram("Signature validity period histogram", HOUR_BUCKETS, _histogram(validity, HOUR_BUCKETS), 'h')
+        _print_histogram("Signature time to expiration histogram", HOUR_BUCKETS, _histogram(remaining, HOUR_BUCKETS), 'h')
+
+    print(f"\nSignatures expiring within {stats.expiring_hours} hours:")
+    for signer in sorted(stats.expiring):
+        entries = sorted(stats.expiring[signer])
+        print(f"  {signer}: {len(entries)}")
+        for expiration, owner, covered in entries:
+            when = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(expiration))
+            print(f"    {when} {owner} {covered}")
+
+def main():
+    parser = argparse.ArgumentParser(description='TTL and RRSIG validity analytics for gzipped zone files')
+    parser.add_argument('files', nargs='+', help='Paths to the gzipped zone files')
+    parser.add_argument('--expiring-hours', type=int, default=72, help='List signatures expiring within this many hours (default is 72)')
+    parser.add_argument('--now', type=int, help='Reference time in epoch seconds (default is the current time)')
+    args = parser.parse_args()
+
+    now = args.now if args.now is not None else int(time.time())
+
+    for filename in args.files:
+        try:
+            stats = analyze_zone(filename, now, args.expiring_hours)
+        except FileNotFoundError:
+            print(f"Error: File '{filename}' not found.")
+            continue
+        print_stats(filename, stats)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import argparse
+import gzip
+import struct
+from array import array
+
+from zonereader import read_records
+
+GRAPH_MAGIC = b'GLUEJOIN1'
+
+def _group(keys, values, key_count):
+    """ Counting sort of (key, value) pairs; returns (offsets, values) so key k owns values[offsets[k]:offsets[k + 1]]. """
+    offsets = array('q', [0]) * (key_count + 1)
+    for key in keys:
+        offsets[key + 1] += 1
+    for i in range(key_count):
+        offsets[i + 1] += offsets[i]
+    grouped = array('i', [0]) * len(keys)
+    cursor = array('q', offsets)
+    for key, value in zip(keys, values):
+        grouped[cursor[key]] = value
+        cursor[key] += 1
+    return offsets, grouped
+
+class DelegationGraph:
+    """ Delegations and glue of one zone with every name and address interned to an integer ID.
+
+    delegation_domains/delegation_hosts hold one (domain, NS host) pair per NS
+    record below the apex; glue_hosts/glue_addresses one (host, address) pair
+    per A/AAAA record. The grouped indexes are built once, after loading.
+    """
+
+    def __init__(self, apex=None):
+        self.apex = apex
+        self.names = []
+        self.name_ids = {}
+        self.addresses = []
+        self.address_ids = {}
+        self.delegation_domains = array('i')
+        self.delegation_hosts = array('i')
+        self.glue_hosts = array('i')
+        self.glue_addresses = array('i')
+
+    def _name_id(self, name):
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = self.name_ids[name] = len(self.names)
+            self.names.append(name)
+        return name_id
+
+    def _address_id(self, address):
+        address_id = self.address_ids.get(address)
+        if address_id is None:
+            address_id = self.address_ids[address] = len(self.addresses)
+            self.addresses.append(address)
+        return address_id
+
+    def load_zone(self, filename):
+        """ One pass over a zone file collecting NS and A/AAAA records. """
+        for fields in read_records(filename):
+            if len(fields) < 5:
+                continue
+            record_type = fields[3].lower()
+            if record_type == 'ns':
+                self.delegation_domains.append(self._name_id(fields[0].lower()))
+                self.delegation_hosts.append(self._name_id(fields[4].lower()))
+            elif record_type in ('a', 'aaaa'):
+                self.glue_hosts.append(self._name_id(fields[0].lower()))
+                self.glue_addresses.append(self._address_id(fields[4].lower()))
+            elif record_type == 'soa' and self.apex is None:
+                self.apex = fields[0].lower()
+
+        # The apex is only known for certain once the SOA has been seen, so its
+        # own NS records are dropped after the pass
+        apex_id = self.name_ids.get(self.apex)
+        if apex_id is not None:
+            domains, hosts = array('i'), array('i')
+            for domain, host in zip(self.delegation_domains, self.delegation_hosts):
+                if domain != apex_id:
+                    domains.append(domain)
+                    hosts.append(host)
+            self.delegation_domains, self.delegation_hosts = domains, hosts
+        self.build_indexes()
+
+    def build_indexes(self):
+        count = len(self.names)
+        self.host_domains = _group(self.delegation_hosts, self.delegation_domains, count)
+        self.domain_hosts = _group(self.delegation_domains, self.delegation_hosts, count)
+        self.host_addresses = _group(self.glue_hosts, self.glue_addresses, count)
+        self.address_hosts = _group(self.glue_addresses, self.glue_hosts, len(self.addresses))
+
+    @staticmethod
+    def _members(index, key):
+        offsets, values = index
+        return values[offsets[key]:offsets[key + 1]]
+
+    def in_bailiwick(self, name):
+        apex = self.apex or '.'
+        return apex == '.' or name == apex or name.endswith('.' + apex)
+
+    def hosts_without_glue(self):
+        """ In-bailiwick name servers that delegations point at but that have no A/AAAA glue. """
+        hosts = set(self.delegation_hosts)
+        return sorted(self.names[host] for host in hosts
+                      if self.in_bailiwick(self.names[host]) and not self._members(self.host_addresses, host))
+
+    def domains_losing_glue(self, addresses):
+        """ Domains whose in-zone glue would all disappear if these addresses went away. """
+        removed = {self.address_ids[address] for address in addresses if address in self.address_ids}
+        affected_hosts = {host for address in removed for host in self._members(self.address_hosts, address)}
+        candidates = {domain for host in affected_hosts for domain in self._members(self.host_domains, host)}
+
+        losing = []
+        for domain in candidates:
+            glue = {address for host in self._members(self.domain_hosts, domain)
+                    for address in self._members(self.host_addresses, host)}
+            if glue and glue <= removed:
+                losing.append(self.names[domain])
+        return sorted(losing)
+
+    def single_points_of_failure(self, limit):
+        """ Name servers ranked by how many domains list them as their only NS, with total domains served. """
+        sole = {}
+        offsets, hosts = self.domain_hosts
+        for domain in range(len(self.names)):
+            start, end = offsets[domain], offsets[domain + 1]
+            if end - start and len(set(hosts[start:end])) == 1:
+                sole[hosts[start]] = sole.get(hosts[start], 0) + 1
+        ranked = sorted(sole.items(), key=lambda item: (-item[1], self.names[item[0]]))[:limit]
+        served = self.host_domains[0]
+        return [(self.names[host], count, served[host + 1] - served[host]) for host, count in ranked]
+
+    def save(self, path):
+        sections = [
+            (self.apex or '').encode('utf-8'),
+            '\n'.join(self.names).encode('utf-8'),
+            '\n'.join(self.addresses).encode('utf-8'),
+            self.delegation_domains.tobytes(),
+            self.delegation_hosts.tobytes(),
+            self.glue_hosts.tobytes(),
+            self.glue_addresses.tobytes(),
+        ]
+        with gzip.open(path, 'wb') as file:
+            file.write(GRAPH_MAGIC)
+            for section in sections:
+                file.write(struct.pack('<Q', len(section)))
+                file.write(section)
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, 'rb') as file:
+            if file.read(len(GRAPH_MAGIC)) != GRAPH_MAGIC:
+                raise ValueError(f"'{path}' is not a saved delegation graph")
+            sections = []
+            for _ in range(7):
+                length = struct.unpack('<Q', file.read(8))[0]
+                sections.append(file.read(length))
+
+        graph = cls(sections[0].decode('utf-8') or None)
+        graph.names = sections[1].decode('utf-8').split('\n') if sections[1] else []
+        graph.name_ids = {name: i for i, name in enumerate(graph.names)}
+        graph.addresses = sections[2].decode('utf-8').split('\n') if sections[2] else []
+        graph.address_ids = {address: i for i, address in enumerate(graph.addresses)}
+        for attribute, data in zip(('delegation_domains', 'delegation_hosts', 'glue_hosts', 'glue_addresses'), sections[3:]):
+            values = array('i')
+            values.frombytes(data)
+            setattr(graph, attribute, values)
+        graph.build_indexes()
+        return graph
+
+def main():
+    parser = argparse.ArgumentParser(description='Join delegations with in-bailiwick glue and analyze name server dependencies')
+    parser.add_argument('filename', nargs='?', help='Path to the gzipped zone file')
+    parser.add_argument('--zone', help='Zone apex (default is the owner of the SOA record)')
+    parser.add_argument('--load', help='Load a graph saved with --save instead of reading a zone file')
+    parser.add_argument('--save', help='Save the joined graph to this file for later queries')
+    parser.add_argument('--no-glue', action='store_true', help='List in-bailiwick name servers without glue')
+    parser.add_argument('--lose-glue', nargs='+', metavar='ADDRESS', help='List domains that lose all in-zone glue if these addresses go away')
+    parser.add_argument('--spof', type=int, metavar='K', help='List the K name servers that are the only NS for the most domains')
+    args = parser.parse_args()
+
+    try:
+        if args.load:
+            graph = DelegationGraph.load(args.load)
+        elif args.filename:
+            graph = DelegationGraph(args.zone.lower() if args.zone else None)
+            graph.load_zone(args.filename)
+        else:
+            print("Error: You must specify a zone file or --load.")
+            parser.print_help()
+            return
+    except FileNotFoundError as e:
+        print(f"Error: File '{e.filename}' not found.")
+        return
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+
+    print(f"Zone {graph.apex or '(unknown apex)'}: {len(graph.delegation_domains)} delegation records, "
+          f"{len(graph.glue_hosts)} address records, {len(graph.names)} names")
+
+    if args.save:
+        graph.save(args.save)
+    if args.no_glue:
+        print("\nIn-bailiwick name servers without glue:\n")
+        for host in graph.hosts_without_glue():
+            print(host)
+    if args.lose_glue:
+        print(f"\nDomains losing all in-zone glue without {', '.join(args.lose_glue)}:\n")
+        for domain in graph.domains_losing_glue([address.lower() for address in args.lose_glue]):
+            print(domain)
+    if args.spof:
+        print("\nName servers that are the only NS of the most domains:\n")
+        for host, sole, served in graph.single_points_of_failure(args.spof):
+            print(f"{host}: only NS for {sole} domains, NS for {served} domains")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,16 @@
 import gzip
+import os
+import re
+import shutil
 import sys
+import tempfile
 import concurrent.futures
 import argparse
 from collections import Counter
 
+import heavyhitters
+from zonereader import read_records
+
 # Define DNS record types
 VALID_RECORD_TYPES = {"a", "aaaa", "dnskey", "ds", "ns", "nsec3", "nsec3param", "rrsig", "soa"}
 
@@ -143,6 +150,243 @@ def list_record_types(file_path):
     for record_type in sorted(record_types):
         print(record_type)
 
+def compile_query(text):
+    """ Compile one query such as "type=ns owner=.example. ttl=300-86400" into a record type set and terms.
+
+    Terms are ANDed: type=a,aaaa; owner=SUFFIX or owner~REGEX; rdata=EXACT or
+    rdata~REGEX; ttl=N or ttl=LOW-HIGH. Each term comes back as (key, op, value)
+    with the value lowercased, compiled or parsed.
+    """
+    record_types = None
+    terms = []
+
+    for term in text.split():
+        match = re.fullmatch(r'(type|owner|rdata|ttl)(=|~)(.+)', term)
+        if not match:
+            raise ValueError(f"invalid term '{term}'")
+        key, op, value = match.groups()
+
+        if key == 'type' and op == '=':
+            record_types = set(value.lower().split(','))
+        elif key in ('owner', 'rdata') and op == '=':
+            terms.append((key, op, value.lower()))
+        elif key in ('owner', 'rdata') and op == '~':
+            try:
+                terms.append((key, op, re.compile(value, re.IGNORECASE)))
+            except re.error as e:
+                raise ValueError(f"invalid regular expression '{value}': {e}")
+        elif key == 'ttl' and op == '=':
+            low, _, high = value.partition('-')
+            if not low.isdigit() or (high and not high.isdigit()):
+                raise ValueError(f"invalid TTL range '{value}'")
+            terms.append((key, op, (int(low), int(high or low))))
+        else:
+            raise ValueError(f"invalid term '{term}'")
+
+    return record_types, terms
+
+def load_queries(query_path):
+    """ Read named queries, one "name: terms" per line; blank lines and lines starting with '#' are skipped. """
+    queries = []
+    names = set()
+    with open(query_path, 'r') as file:
+        for number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            name, sep, text = line.partition(':')
+            name = name.strip()
+            if not sep or not re.fullmatch(r'[\w.-]+', name):
+                raise ValueError(f"line {number}: expected 'name: terms'")
+            if name in names:
+                raise ValueError(f"line {number}: duplicate query name '{name}'")
+            names.add(name)
+            try:
+                record_types, terms = compile_query(text)
+            except ValueError as e:
+                raise ValueError(f"line {number}: {e}")
+            queries.append((name, record_types, terms))
+    return queries
+
+def _term_matches(term, fields, texts):
+    key, op, value = term
+    if key == 'ttl':
+        return fields[1].isdigit() and value[0] <= int(fields[1]) <= value[1]
+    text, lowered = texts[key]
+    if op == '~':
+        return value.search(text) is not None
+    return lowered.endswith(value) if key == 'owner' else lowered == value
+
+class QueryIndex:
+    """ Finds the queries a record satisfies without testing every query against it.
+
+    Each query is filed under one of its terms: an exact rdata value in a dict,
+    an owner suffix under the whole labels at its end and then the tail of
+    the label before them, or an owner or rdata regular expression in one
+    alternation per field. The remaining terms are only tested for the queries
+    those lookups turn up, and for the queries with none of these terms,
+    which are dispatched on record type as before.
+    """
+
+    def __init__(self, queries):
+        self.rdata = {}
+        self.suffixes = {}
+        self.regexes = {'owner': [], 'rdata': []}
+        self.combined = {}
+        self.by_type = {}
+        self.any_type = []
+
+        for index, (_, record_types, terms) in enumerate(queries):
+            self._add(index, record_types, terms)
+
+        for key, entries in self.regexes.items():
+            if not entries:
+                continue
+            try:
+                self.combined[key] = re.compile('|'.join(f"(?P<q{index}>{term[2].pattern})" for index, _, term, _ in entries), re.IGNORECASE)
+            except re.error:
+                # Some pattern only compiles on its own, say with an inline flag that must come first
+                for index, record_types, term, rest in entries:
+                    self._add_unindexed(index, record_types, [term] + rest)
+                self.regexes[key] = []
+
+    def _add(self, index, record_types, terms):
+        def pick(accept):
+            for term in terms:
+                if accept(term):
+                    return term, [other for other in terms if other is not term]
+            return None, terms
+
+        term, rest = pick(lambda term: term[:2] == ('rdata', '='))
+        if term:
+            self.rdata.setdefault(term[2], []).append((index, record_types, None, rest))
+            return
+
+        term, rest = pick(lambda term: term[:2] == ('owner', '=') and '.' in term[2])
+        if term:
+            # Everything after the first dot is made of whole labels; whatever
+            # comes before it has to end the owner's label in front of those
+            head, _, labels = term[2].partition('.')
+            aligned, partial, lengths = self.suffixes.setdefault(labels, ([], {}, set()))
+            if head:
+                partial.setdefault(head, []).append((index, record_types, None, rest))
+                lengths.add(len(head))
+            else:
+                aligned.append((index, record_types, None, rest))
+            return
+
+        # Patterns with groups of their own stay out of the alternation, as a
+        # numbered backreference would point at the wrong group there
+        term, rest = pick(lambda term: term[1] == '~' and term[2].groups == 0)
+        if term:
+            self.regexes[term[0]].append((index, record_types, term, rest))
+            return
+
+        self._add_unindexed(index, record_types, terms)
+
+    def _add_unindexed(self, index, record_types, terms):
+        if record_types is None:
+            self.any_type.append((index, None, None, terms))
+        else:
+            for record_type in record_types:
+                self.by_type.setdefault(record_type, []).append((index, record_types, None, terms))
+
+    def matches(self, fields):
+        """ Yield the index of every query the record's fields satisfy. """
+        record_type = fields[3].lower()
+        owner, rdata = fields[0], ' '.join(fields[4:])
+        texts = {'owner': (owner, owner.lower()), 'rdata': (rdata, rdata.lower())}
+
+        candidates = list(self.rdata.get(texts['rdata'][1], ()))
+        lowered = texts['owner'][1]
+        start, dot = 0, lowered.find('.')
+        while dot >= 0:
+            found = self.suffixes.get(lowered[dot + 1:])
+            if found:
+                aligned, partial, lengths = found
+                candidates += aligned
+                for length in lengths:
+                    if length <= dot - start:
+                        candidates += partial.get(lowered[dot - length:dot], ())
+            start, dot = dot + 1, lowered.find('.', dot + 1)
+        for key, combined in self.combined.items():
+            match = combined.search(texts[key][0])
+            if match:
+                for index, record_types, term, rest in self.regexes[key]:
+                    # The group that matched needs no second search
+                    candidates.append((index, record_types, None if match.lastgroup == f"q{index}" else term, rest))
+        candidates += self.by_type.get(record_type, ())
+        candidates += self.any_type
+
+        for index, record_types, term, rest in candidates:
+            if record_types is not None and record_type not in record_types:
+                continue
+            if term is not None and not _term_matches(term, fields, texts):
+                continue
+            if all(_term_matches(other, fields, texts) for other in rest):
+                yield index
+
+def run_queries(file_path, query_path, output_dir=None):
+    try:
+        queries = load_queries(query_path)
+    except FileNotFoundError:
+        print(f"Error: The file {query_path} was not found.")
+        return
+    except ValueError as e:
+        print(f"Error: {query_path} {e}")
+        return
+
+    index = QueryIndex(queries)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        outputs = [open(os.path.join(output_dir, f"{name}.txt"), 'w') for name, _, _ in queries]
+    else:
+        # Matches are spooled to disk rather than held in memory until they are printed
+        outputs = [tempfile.TemporaryFile('w+', encoding='utf-8') for _ in queries]
+    counts = [0] * len(queries)
+
+    try:
+        for line, fields in read_records(file_path, with_lines=True):
+            if len(fields) < 4:
+                continue
+            for query in index.matches(fields):
+                counts[query] += 1
+                outputs[query].write(line.rstrip() + '\n')
+
+        for query, (name, _, _) in enumerate(queries):
+            if output_dir:
+                print(f"{name}: {counts[query]} records written to {os.path.join(output_dir, name + '.txt')}")
+            else:
+                print(f"\nQuery '{name}': {counts[query]} records\n")
+                sys.stdout.flush()
+                outputs[query].seek(0)
+                shutil.copyfileobj(outputs[query], sys.stdout)
+    except FileNotFoundError:
+        print(f"Error: The file {file_path} was not found.")
+        return
+    except IOError:
+        print(f"Error: An error occurred while reading the file {file_path}.")
+        return
+    finally:
+        for output in outputs:
+            output.close()
+
+def top_name_servers(file_path, count, exact, num_threads):
+    try:
+        top = heavyhitters.top_heavy_hitters([file_path], 'ns', count, exact, num_threads)
+    except FileNotFoundError:
+        print(f"Error: The file {file_path} was not found.")
+        return
+    heavyhitters.print_top(f"Top {count} Name Servers by delegated domains", top)
+
+def top_owners(file_path, count, exact, num_threads):
+    try:
+        top = heavyhitters.top_heavy_hitters([file_path], 'owner', count, exact, num_threads)
+    except FileNotFoundError:
+        print(f"Error: The file {file_path} was not found.")
+        return
+    heavyhitters.print_top(f"Top {count} Owners by number of records", top)
+
 def main():
     parser = argparse.ArgumentParser(description="Process DNS records from a gzipped TLD Zone Transfer file.")
     parser.add_argument("file", nargs='?', help="Path to the gzipped file.")
@@ -153,6 +397,11 @@ def main():
     parser.add_argument("-c", "--compare", nargs=2, metavar=('file1', 'file2'), help="Compare two gzipped zone files.")
     parser.add_argument("-e", "--enumerate-counts", action="store_true", help="Enumerate counts of each DNS record type in the file.")
     parser.add_argument("--list-record-types", action="store_true", help="List the DNS record types present in the file.")
+    parser.add_argument("--top-name-servers", type=int, metavar="K", help="List the K name servers with the most delegated domains.")
+    parser.add_argument("--top-owners", type=int, metavar="K", help="List the K owners with the most records.")
+    parser.add_argument("--exact", action="store_true", help="Count exactly with --top-name-servers/--top-owners instead of using a sketch.")
+    parser.add_argument("-q", "--queries", help="Run a batch of named filter queries from this file in a single pass.")
+    parser.add_argument("-o", "--output-dir", help="Write each query's matches to <name>.txt in this directory.")
 
     args = parser.parse_args()
 
@@ -176,6 +425,24 @@ def main():
         else:
             print("Error: You must specify a file with --list-record-types.")
             parser.print_help()
+    elif args.top_name_servers:
+        if args.file:
+            top_name_servers(args.file, args.top_name_servers, args.exact, args.threads)
+        else:
+            print("Error: You must specify a file with --top-name-servers.")
+            parser.print_help()
+    elif args.top_owners:
+        if args.file:
+            top_owners(args.file, args.top_owners, args.exact, args.threads)
+        else:
+            print("Error: You must specify a file with --top-owners.")
+            parser.print_help()
+    elif args.queries:
+        if args.file:
+            run_queries(args.file, args.queries, args.output_dir)
+        else:
+            print("Error: You must specify a file with --queries.")
+            parser.print_help()
     elif args.record_type and args.name_server:
         if args.file:
             filter_records(args.file, args.record_type, args.name_server, args.threads)
@@ -0,0 +1,367 @@
+import argparse
+import bisect
+import concurrent.futures
+import ctypes
+import ctypes.util
+import os
+import struct
+import zlib
+from collections import Counter
+
+# The access point machinery (stopping at deflate block boundaries, priming
+# bits, setting a window) is not exposed by Python's zlib module, so talk to
+# the zlib library directly, the same way zran.c does.
+_libz = ctypes.CDLL(ctypes.util.find_library('z') or 'libz.so.1')
+_libz.zlibVersion.restype = ctypes.c_char_p
+
+Z_NO_FLUSH = 0
+Z_BLOCK = 5
+Z_OK = 0
+Z_STREAM_END = 1
+Z_BUF_ERROR = -5
+
+WINDOW_SIZE = 32768
+CHUNK_SIZE = 1 << 16
+DEFAULT_SPAN = 1 << 20
+INDEX_MAGIC = b'GZIDX\x01'
+INDEX_SUFFIX = '.gzidx'
+
+class _ZStream(ctypes.Structure):
+    _fields_ = [
+        ('next_in', ctypes.c_void_p),
+        ('avail_in', ctypes.c_uint),
+        ('total_in', ctypes.c_ulong),
+        ('next_out', ctypes.c_void_p),
+        ('avail_out', ctypes.c_uint),
+        ('total_out', ctypes.c_ulong),
+        ('msg', ctypes.c_char_p),
+        ('state', ctypes.c_void_p),
+        ('zalloc', ctypes.c_void_p),
+        ('zfree', ctypes.c_void_p),
+        ('opaque', ctypes.c_void_p),
+        ('data_type', ctypes.c_int),
+        ('adler', ctypes.c_ulong),
+        ('reserved', ctypes.c_ulong),
+    ]
+
+class _Inflater:
+    """ Minimal wrapper around a zlib inflate stream fed from a file object. """
+
+    def __init__(self, file, wbits):
+        self.file = file
+        self.stream = _ZStream()
+        self.output = ctypes.create_string_buffer(CHUNK_SIZE)
+        self.input = b''
+        self.position = 0
+        ret = _libz.inflateInit2_(ctypes.byref(self.stream), wbits, _libz.zlibVersion(), ctypes.sizeof(_ZStream))
+        if ret != Z_OK:
+            raise zlib.error(f"inflateInit2 failed ({ret})")
+
+    def close(self):
+        _libz.inflateEnd(ctypes.byref(self.stream))
+
+    def pending(self):
+        return len(self.input) - self.position
+
+    def fill(self):
+        if self.pending() == 0:
+            self.input = self.file.read(CHUNK_SIZE)
+            self.position = 0
+        return self.pending() > 0
+
+    def skip(self, count):
+        # Step over bytes zlib will not consume itself, such as a raw member's trailer
+        while count:
+            if not self.fill():
+                raise EOFError("Compressed file ended inside a gzip trailer")
+            step = min(count, self.pending())
+            self.position += step
+            count -= step
+
+    def at_end(self):
+        # True when nothing but zero padding is left in the file
+        while self.fill():
+            if self.input[self.position:].strip(b'\x00'):
+                return False
+            self.position = len(self.input)
+        return True
+
+    def reset(self, wbits):
+        _libz.inflateReset2(ctypes.byref(self.stream), wbits)
+
+    def prime(self, bits, value):
+        _libz.inflatePrime(ctypes.byref(self.stream), bits, value)
+
+    def set_dictionary(self, window):
+        _libz.inflateSetDictionary(ctypes.byref(self.stream), window, len(window))
+
+    def inflate(self, flush):
+        """ Run inflate once; returns (zlib return code, output bytes, input bytes consumed). """
+        stream = self.stream
+        data = self.input[self.position:]
+        buffer = ctypes.create_string_buffer(data, len(data))
+        stream.next_in = ctypes.cast(buffer, ctypes.c_void_p)
+        stream.avail_in = len(data)
+        stream.next_out = ctypes.cast(self.output, ctypes.c_void_p)
+        stream.avail_out = CHUNK_SIZE
+
+        ret = _libz.inflate(ctypes.byref(stream), flush)
+        if ret not in (Z_OK, Z_STREAM_END, Z_BUF_ERROR):
+            message = stream.msg.decode() if stream.msg else f"error {ret}"
+            raise zlib.error(f"Error -{abs(ret)} while decompressing data: {message}")
+
+        consumed = len(data) - stream.avail_in
+        self.position += consumed
+        return ret, self.output.raw[:CHUNK_SIZE - stream.avail_out], consumed
+
+class AccessPoint:
+    def __init__(self, out, inp, bits, window, owner=''):
+        self.out = out
+        self.inp = inp
+        self.bits = bits
+        self.window = window
+        self.owner = owner
+
+def _first_owner(data):
+    # data starts with the byte before the access point, so a record only
+    # counts once a newline has been seen
+    lines = data.split(b'\n')
+    for line in lines[1:-1]:
+        if line.startswith(b';'):
+            continue
+        fields = line.split()
+        if fields:
+            return fields[0].decode('utf-8', 'replace')
+    return None
+
+def build_index(filename, span=DEFAULT_SPAN):
+    """ Decompress a gzip file once and record an access point roughly every span bytes of output. """
+    points = []
+    history = b''
+    total_in = total_out = last = 0
+    capture = None
+
+    with open(filename, 'rb') as file:
+        inflater = _Inflater(file, 47)
+        try:
+            while True:
+                if not inflater.fill():
+                    raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+
+                ret, data, consumed = inflater.inflate(Z_BLOCK)
+                total_in += consumed
+                total_out += len(data)
+                history = (history + data)[-WINDOW_SIZE:]
+
+                if capture is not None:
+                    capture += data
+                    owner = _first_owner(capture)
+                    if owner is not None or len(capture) > (1 << 20):
+                        points[-1].owner = owner or ''
+                        capture = None
+
+                if ret == Z_STREAM_END:
+                    if inflater.at_end():
+                        break
+                    # Another gzip member follows; keep going with a fresh header
+                    inflater.reset(47)
+                    continue
+
+                # Access points sit on deflate block boundaries, never inside the last block
+                data_type = inflater.stream.data_type
+                if data_type & 128 and not data_type & 64 and (total_out == 0 or total_out - last > span):
+                    points.append(AccessPoint(total_out, total_in, data_type & 7, history))
+                    capture = bytearray(history[-1:] or b'\n')
+                    last = total_out
+        finally:
+            inflater.close()
+
+    if capture is not None:
+        points[-1].owner = _first_owner(capture + b'\n') or ''
+
+    return points, total_out
+
+def index_path(filename):
+    return filename + INDEX_SUFFIX
+
+def write_index(filename, points, size):
+    stat = os.stat(filename)
+    with open(index_path(filename), 'wb') as file:
+        file.write(INDEX_MAGIC)
+        file.write(struct.pack('<QQQI', stat.st_size, stat.st_mtime_ns, size, len(points)))
+        for point in points:
+            owner = point.owner.encode('utf-8')
+            window = zlib.compress(point.window)
+            file.write(struct.pack('<QQBHI', point.out, point.inp, point.bits, len(owner), len(window)))
+            file.write(owner)
+            file.write(window)
+
+def read_index(filename):
+    """ Load the sidecar index for a gzip file; returns (points, uncompressed size). """
+    with open(index_path(filename), 'rb') as file:
+        if file.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+            raise ValueError(f"'{index_path(filename)}' is not a gzip index")
+        compressed_size, mtime_ns, size, count = struct.unpack('<QQQI', file.read(28))
+        stat = os.stat(filename)
+        if stat.st_size != compressed_size or stat.st_mtime_ns != mtime_ns:
+            raise ValueError(f"'{index_path(filename)}' is out of date for '{filename}'")
+
+        points = []
+        for _ in range(count):
+            out, inp, bits, owner_len, window_len = struct.unpack('<QQBHI', file.read(23))
+            owner = file.read(owner_len).decode('utf-8')
+            window = zlib.decompress(file.read(window_len))
+            points.append(AccessPoint(out, inp, bits, window, owner))
+        return points, size
+
+def read_from(filename, point, end=None):
+    """ Yield decompressed blocks starting at an access point, stopping at the end offset if given. """
+    with open(filename, 'rb') as file:
+        file.seek(point.inp - (1 if point.bits else 0))
+        inflater = _Inflater(file, -15)
+        try:
+            if point.bits:
+                inflater.prime(point.bits, file.read(1)[0] >> (8 - point.bits))
+            inflater.set_dictionary(point.window)
+
+            raw = True
+            position = point.out
+            while end is None or position < end:
+                if not inflater.fill():
+                    raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+                ret, data, _ = inflater.inflate(Z_NO_FLUSH)
+                if end is not None and position + len(data) > end:
+                    data = data[:end - position]
+                position += len(data)
+                if data:
+                    yield data
+
+                if ret == Z_STREAM_END:
+                    if raw:
+                        inflater.skip(8)
+                    if inflater.at_end():
+                        return
+                    inflater.reset(47)
+                    raw = False
+        finally:
+            inflater.close()
+
+def read_lines(filename, points, start, stop):
+    """ Yield the lines that begin between access points start and stop (stop may be len(points)). """
+    yield from read_range(filename, points[start], points[stop].out if stop < len(points) else None)
+
+def read_range(filename, first, end=None):
+    """ Yield the lines that begin at or after an access point and before the end offset, if given.
+
+    Needs no index, so a worker process can be handed just the point and the offset.
+    """
+    # A line straddling the starting point belongs to the previous range
+    at_line_start = first.out == 0 or first.window[-1:] == b'\n'
+    buffer = b''
+    offset = first.out
+
+    for block in read_from(filename, first):
+        buffer += block
+        begin = 0
+        if not at_line_start:
+            cut = buffer.find(b'\n')
+            if cut < 0:
+                continue
+            begin = cut + 1
+            at_line_start = True
+
+        while end is None or offset + begin < end:
+            cut = buffer.find(b'\n', begin)
+            if cut < 0:
+                break
+            yield buffer[begin:cut].decode('utf-8')
+            begin = cut + 1
+        else:
+            return
+        offset += begin
+        buffer = buffer[begin:]
+
+    if buffer and at_line_start and (end is None or offset < end):
+        yield buffer.decode('utf-8')
+
+def _count_range(filename, point, end):
+    record_types = Counter()
+    for line in read_range(filename, point, end):
+        if line.startswith(';'):
+            continue
+        fields = line.split()
+        if len(fields) >= 4:
+            record_types[fields[3]] += 1
+    return record_types
+
+def count_record_types(filename, workers=None):
+    """ Count record types by decompressing index ranges on several processes at once. """
+    points, _ = read_index(filename)
+    workers = workers or os.cpu_count() or 1
+    # A few ranges per worker keeps the processes busy when ranges differ in cost
+    step = max(1, len(points) // (workers * 4))
+    # Each task gets its own access point and end offset rather than loading the whole index again
+    ranges = [(points[start], points[start + step].out if start + step < len(points) else None) for start in range(0, len(points), step)]
+
+    record_types = Counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_count_range, filename, point, end) for point, end in ranges]
+        for future in futures:
+            record_types.update(future.result())
+    return record_types
+
+def lookup(filename, prefix):
+    """ Yield the records whose owner starts with prefix, for zones sorted by owner name. """
+    points, _ = read_index(filename)
+    owners = [point.owner for point in points]
+    # Start from the last access point whose first owner sorts before the prefix
+    start = 0
+    for i in range(bisect.bisect_left(owners, prefix) - 1, -1, -1):
+        if owners[i]:
+            start = i
+            break
+
+    for line in read_lines(filename, points, start, len(points)):
+        if line.startswith(';'):
+            continue
+        fields = line.split()
+        if not fields:
+            continue
+        if fields[0].startswith(prefix):
+            yield line
+        elif fields[0] > prefix:
+            return
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and use a random access index for gzipped zone files')
+    parser.add_argument('filename', help='Path to the gzipped zone file')
+    parser.add_argument('--build', action='store_true', help='Build the index next to the file')
+    parser.add_argument('--span', type=float, default=DEFAULT_SPAN / (1 << 20), help='Megabytes of uncompressed data between access points (default is 1)')
+    parser.add_argument('--count', action='store_true', help='Count DNS record types, decompressing index ranges in parallel')
+    parser.add_argument('-w', '--workers', type=int, help='Number of processes to use with --count (default is the number of CPUs)')
+    parser.add_argument('--lookup', metavar='PREFIX', help='Print records whose owner starts with PREFIX (zone must be sorted)')
+    args = parser.parse_args()
+
+    filename = args.filename
+
+    try:
+        if args.build:
+            points, size = build_index(filename, int(args.span * (1 << 20)))
+            write_index(filename, points, size)
+            print(f"Indexed {filename}: {len(points)} access points over {size} bytes")
+        if args.count:
+            for record_type, count in sorted(count_record_types(filename, args.workers).items()):
+                print(f"{record_type}: {count}")
+        if args.lookup:
+            for line in lookup(filename, args.lookup):
+                print(line)
+        if not (args.build or args.count or args.lookup):
+            print("Error: You must specify an operation.")
+            parser.print_help()
+    except FileNotFoundError as e:
+        print(f"Error: File '{e.filename}' not found.")
+    except ValueError as e:
+        print(f"Error: {e}")
+
+if __name__ == "__main__":
+    main()
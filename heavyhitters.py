@@ -0,0 +1,198 @@
+import argparse
+import concurrent.futures
+import heapq
+import os
+import zlib
+from array import array
+from collections import Counter
+
+import numpy as np
+
+import gzindex
+from zonereader import read_records
+
+DEFAULT_WIDTH = 1 << 20
+DEFAULT_DEPTH = 4
+
+class CountMinSketch:
+    """ Count-Min sketch; estimates never undercount and overcount by at most about e * total / width. """
+
+    def __init__(self, width=DEFAULT_WIDTH, depth=DEFAULT_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self.table = array('Q', [0]) * (width * depth)
+
+    def _cells(self, data):
+        # crc32 with a per-row seed is deterministic across processes, unlike hash()
+        width = self.width
+        return [row * width + zlib.crc32(data, row) % width for row in range(self.depth)]
+
+    def add(self, key, count=1):
+        """ Count key and return its new estimate. """
+        table = self.table
+        estimate = None
+        for cell in self._cells(key.encode('utf-8')):
+            table[cell] += count
+            if estimate is None or table[cell] < estimate:
+                estimate = table[cell]
+        self.total += count
+        return estimate
+
+    def estimate(self, key):
+        return min(self.table[cell] for cell in self._cells(key.encode('utf-8')))
+
+    def merge(self, other):
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("Count-Min sketches must have the same width and depth to merge")
+        # Add the tables in place through numpy views of their buffers
+        table = np.frombuffer(self.table, dtype=np.uint64)
+        np.add(table, np.frombuffer(other.table, dtype=np.uint64), out=table)
+        self.total += other.total
+
+class TopK:
+    """ Approximate top-k counter in bounded memory: a Count-Min sketch plus a heap of the k best candidates. """
+
+    def __init__(self, k, width=DEFAULT_WIDTH, depth=DEFAULT_DEPTH):
+        self.k = k
+        self.sketch = CountMinSketch(width, depth)
+        self.candidates = {}
+        self.heap = []
+
+    def _compact_heap(self):
+        self.heap = [(estimate, key) for key, estimate in self.candidates.items()]
+        heapq.heapify(self.heap)
+
+    def _minimum(self):
+        # Heap entries go stale as candidates grow; drop them lazily
+        heap, candidates = self.heap, self.candidates
+        while heap[0][0] != candidates.get(heap[0][1]):
+            heapq.heappop(heap)
+        return heap[0]
+
+    def add(self, key, count=1):
+        estimate = self.sketch.add(key, count)
+        candidates = self.candidates
+        if key in candidates or len(candidates) < self.k:
+            candidates[key] = estimate
+        elif estimate > self._minimum()[0]:
+            del candidates[heapq.heappop(self.heap)[1]]
+            candidates[key] = estimate
+        else:
+            return
+        heapq.heappush(self.heap, (estimate, key))
+        if len(self.heap) > 8 * self.k:
+            self._compact_heap()
+
+    def merge(self, other):
+        self.sketch.merge(other.sketch)
+        keys = set(self.candidates) | set(other.candidates)
+        estimates = sorted(((self.sketch.estimate(key), key) for key in keys), reverse=True)
+        self.candidates = {key: estimate for estimate, key in estimates[:self.k]}
+        self._compact_heap()
+
+    def top(self):
+        return sorted(((key, estimate) for key, estimate in self.candidates.items()), key=lambda item: (-item[1], item[0]))
+
+class ExactTopK:
+    """ Exact counterpart of TopK for zones small enough to count every key. """
+
+    def __init__(self, k):
+        self.k = k
+        self.counter = Counter()
+
+    def add(self, key, count=1):
+        self.counter[key] += count
+
+    def merge(self, other):
+        self.counter.update(other.counter)
+
+    def top(self):
+        return sorted(self.counter.items(), key=lambda item: (-item[1], item[0]))[:self.k]
+
+def _record_keys(records, by):
+    if by == 'ns':
+        # Name servers weighted by the number of delegations pointing at them
+        for fields in records:
+            if len(fields) >= 5 and fields[3].lower() == 'ns':
+                yield fields[4].lower()
+    else:
+        for fields in records:
+            yield fields[0].lower()
+
+def _indexed_records(filename, point, end):
+    for line in gzindex.read_range(filename, point, end):
+        if line.startswith(';'):
+            continue
+        fields = line.split()
+        if fields:
+            yield fields
+
+def count_heavy_hitters(source, by, k, exact=False, width=DEFAULT_WIDTH, depth=DEFAULT_DEPTH):
+    """ Count one source: a file name, or (file name, access point, end offset) of a gzindex range. """
+    counter = ExactTopK(k) if exact else TopK(k, width, depth)
+    records = _indexed_records(*source) if isinstance(source, tuple) else read_records(source)
+    for key in _record_keys(records, by):
+        counter.add(key)
+    return counter
+
+def _sources(files, workers):
+    # Split indexed files into ranges so a single large zone still uses every worker
+    sources = []
+    for filename in files:
+        try:
+            points, _ = gzindex.read_index(filename)
+        except (OSError, ValueError):
+            sources.append(filename)
+            continue
+        step = max(1, len(points) // workers)
+        # Workers get the access point itself, so none of them reads the index again
+        sources.extend((filename, points[start], points[start + step].out if start + step < len(points) else None)
+                       for start in range(0, len(points), step))
+    return sources
+
+def top_heavy_hitters(files, by, k, exact=False, workers=1, width=DEFAULT_WIDTH, depth=DEFAULT_DEPTH):
+    """ Count files (in parallel when workers > 1) and merge the per-worker sketches. """
+    sources = _sources(files, workers) if workers > 1 else files
+    if len(sources) == 1 or workers <= 1:
+        # A single unindexed file gains nothing from a pool but the cost of shipping the sketch back
+        results = [count_heavy_hitters(source, by, k, exact, width, depth) for source in sources]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(sources))) as executor:
+            futures = [executor.submit(count_heavy_hitters, source, by, k, exact, width, depth) for source in sources]
+            results = [future.result() for future in futures]
+
+    counter = results[0]
+    for other in results[1:]:
+        counter.merge(other)
+    return counter.top()
+
+def print_top(title, top):
+    print(f"\n{title}:\n")
+    for rank, (key, count) in enumerate(top, 1):
+        print(f"{rank}. {key}: {count}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Find the heaviest name servers or owners in gzipped zone files')
+    parser.add_argument('files', nargs='+', help='Paths to the gzipped zone files')
+    parser.add_argument('-k', '--top', type=int, default=1000, help='Number of entries to report (default is 1000)')
+    parser.add_argument('--by', choices=('ns', 'owner'), default='ns', help="Rank name servers by delegations ('ns', default) or owners by records ('owner')")
+    parser.add_argument('--exact', action='store_true', help='Count every key exactly instead of using a sketch')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='Number of processes to use (default is 1)')
+    parser.add_argument('--width', type=int, default=DEFAULT_WIDTH, help=f'Count-Min sketch width (default is {DEFAULT_WIDTH})')
+    parser.add_argument('--depth', type=int, default=DEFAULT_DEPTH, help=f'Count-Min sketch depth (default is {DEFAULT_DEPTH})')
+    args = parser.parse_args()
+
+    missing = [filename for filename in args.files if not os.path.isfile(filename)]
+    if missing:
+        print(f"Error: File '{missing[0]}' not found.")
+        return
+
+    top = top_heavy_hitters(args.files, args.by, args.top, args.exact, args.workers, args.width, args.depth)
+    if args.by == 'ns':
+        print_top(f"Top {args.top} name servers by delegated domains", top)
+    else:
+        print_top(f"Top {args.top} owners by number of records", top)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import argparse
+import json
+import os
+import sys
+import unicodedata
+
+from zonereader import read_records
+
+INDEX_VERSION = 1
+
+# Characters commonly swapped in for Latin letters, mapped to their skeleton
+HOMOGLYPHS = {
+    '0': 'o', '1': 'l', '3': 'e', '4': 'a', '5': 's', '7': 't', '8': 'b', '9': 'g', '|': 'l', '!': 'i',
+    'а': 'a', 'в': 'b', 'е': 'e', 'ё': 'e', 'һ': 'h', 'і': 'i', 'ї': 'i', 'ј': 'j', 'к': 'k', 'м': 'm',
+    'н': 'h', 'о': 'o', 'р': 'p', 'с': 'c', 'т': 't', 'у': 'y', 'х': 'x', 'ѕ': 's', 'ԁ': 'd', 'ԛ': 'q',
+    'ԝ': 'w', 'ɡ': 'g', 'ı': 'i', 'ł': 'l', 'ø': 'o', 'α': 'a', 'β': 'b', 'ε': 'e', 'η': 'n', 'ι': 'i',
+    'κ': 'k', 'ν': 'v', 'ο': 'o', 'ρ': 'p', 'τ': 't', 'υ': 'u', 'χ': 'x', 'ω': 'w',
+}
+# Letter pairs that read as a single letter
+DIGRAPHS = [('rn', 'm'), ('vv', 'w'), ('cl', 'd')]
+
+def decode_label(label):
+    """ Decode an IDNA (xn--) label to Unicode, leaving anything else alone. """
+    if label.startswith('xn--'):
+        try:
+            return label[4:].encode('ascii').decode('punycode')
+        except (UnicodeError, ValueError):
+            pass
+    return label
+
+def skeleton(label):
+    """ Reduce a label to the Latin letters it looks like: punycode decoded, accents and hyphens dropped, homoglyphs mapped. """
+    text = unicodedata.normalize('NFKD', decode_label(label.lower()))
+    text = ''.join(HOMOGLYPHS.get(c, c) for c in text if not unicodedata.combining(c) and c != '-')
+    for pair, letter in DIGRAPHS:
+        text = text.replace(pair, letter)
+    return text
+
+def registered_label(name):
+    """ The label directly below the TLD, e.g. 'example' for 'ns1.example.com.' or 'example.com'. """
+    labels = name.lower().rstrip('.').split('.')
+    return labels[-2] if len(labels) >= 2 else labels[0]
+
+def _deletes(word, distance):
+    variants = {word}
+    for _ in range(distance):
+        variants |= {variant[:i] + variant[i + 1:] for variant in variants for i in range(len(variant))}
+    return variants
+
+def edit_distance(a, b):
+    """ Optimal string alignment distance (Levenshtein plus adjacent transpositions). """
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[len(b)]
+
+def allowed_distance(term, max_distance):
+    # Short brands get no slack, otherwise every three letter name matches
+    return min(max_distance, (len(term) - 1) // 4)
+
+class WatchlistIndex:
+    """ SymSpell-style deletion index over the skeletons of watchlist terms. """
+
+    def __init__(self, terms, max_distance=1):
+        self.max_distance = max_distance
+        self.terms = sorted(set(terms))
+        self.skeletons = [skeleton(registered_label(term)) for term in self.terms]
+        self.deletes = {}
+        for term_id, term_skeleton in enumerate(self.skeletons):
+            for variant in _deletes(term_skeleton, allowed_distance(term_skeleton, max_distance)):
+                self.deletes.setdefault(variant, []).append(term_id)
+        self.by_skeleton = {}
+        for term_id, term_skeleton in enumerate(self.skeletons):
+            self.by_skeleton.setdefault(term_skeleton, []).append(term_id)
+
+    def match(self, name):
+        """ Return (term, reason) pairs for every watchlist term the name looks like. """
+        label = registered_label(name)
+        label_skeleton = skeleton(label)
+        matches = {}
+
+        candidates = set()
+        for variant in _deletes(label_skeleton, self.max_distance):
+            candidates.update(self.deletes.get(variant, ()))
+        for term_id in candidates:
+            term_skeleton = self.skeletons[term_id]
+            distance = edit_distance(label_skeleton, term_skeleton)
+            if distance > allowed_distance(term_skeleton, self.max_distance):
+                continue
+            if distance:
+                matches[term_id] = f"edit distance {distance}"
+            elif label != registered_label(self.terms[term_id]):
+                matches[term_id] = "homoglyph"
+            else:
+                matches[term_id] = "exact"
+
+        # Brand plus filler words, e.g. paypal-login
+        if '-' in label:
+            for token in decode_label(label).split('-'):
+                for term_id in self.by_skeleton.get(skeleton(token), ()):
+                    matches.setdefault(term_id, "contains")
+
+        return sorted((self.terms[term_id], reason) for term_id, reason in matches.items())
+
+    def save(self, path):
+        with open(path, 'w') as file:
+            json.dump({'version': INDEX_VERSION, 'max_distance': self.max_distance, 'terms': self.terms,
+                       'skeletons': self.skeletons, 'deletes': self.deletes}, file)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as file:
+            data = json.load(file)
+        if data.get('version') != INDEX_VERSION:
+            raise ValueError(f"'{path}' was built by an incompatible version")
+        index = cls.__new__(cls)
+        index.max_distance = data['max_distance']
+        index.terms = data['terms']
+        index.skeletons = data['skeletons']
+        index.deletes = data['deletes']
+        index.by_skeleton = {}
+        for term_id, term_skeleton in enumerate(index.skeletons):
+            index.by_skeleton.setdefault(term_skeleton, []).append(term_id)
+        return index
+
+def read_watchlist(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return [line.strip() for line in file if line.strip() and not line.startswith('#')]
+
+def load_index(watchlist_path, index_path=None, max_distance=1):
+    """ Load the saved index for a watchlist, rebuilding it when the watchlist or distance changed. """
+    index_path = index_path or watchlist_path + '.idx'
+    if os.path.exists(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(watchlist_path):
+        try:
+            index = WatchlistIndex.load(index_path)
+            if index.max_distance == max_distance:
+                return index
+        except (ValueError, KeyError):
+            pass
+    index = WatchlistIndex(read_watchlist(watchlist_path), max_distance)
+    index.save(index_path)
+    return index
+
+def print_matches(index, names):
+    seen = set()
+    for name in names:
+        if name in seen:
+            continue
+        seen.add(name)
+        for term, reason in index.match(name):
+            print(f"{name} -> {term} ({reason})")
+
+def main():
+    parser = argparse.ArgumentParser(description='Match domain names against a brand watchlist for typosquats and lookalikes')
+    parser.add_argument('watchlist', help='File with one watched name per line')
+    parser.add_argument('files', nargs='*', help='Gzipped zone files to check (default is names on standard input)')
+    parser.add_argument('-d', '--max-distance', type=int, default=1, help='Largest edit distance to report (default is 1)')
+    parser.add_argument('--index', help='Where to keep the prebuilt index (default is WATCHLIST.idx)')
+    args = parser.parse_args()
+
+    try:
+        index = load_index(args.watchlist, args.index, args.max_distance)
+    except FileNotFoundError:
+        print(f"Error: File '{args.watchlist}' not found.")
+        return
+
+    if not args.files:
+        print_matches(index, (line.split()[0] for line in sys.stdin if line.split()))
+        return
+
+    for filename in args.files:
+        try:
+            print_matches(index, (fields[0] for fields in read_records(filename)))
+        except FileNotFoundError:
+            print(f"Error: File '{filename}' not found.")
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@ import os
 import argparse
 import gzip
 
+from lookalike import load_index
+
 def is_gzip_file(filepath):
     """ Check if a file is a valid gzip file by attempting to read the gzip magic number. """
     try:
@@ -10,7 +12,7 @@ def is_gzip_file(filepath):
     except IOError:
         return False
 
-def find_unique_lines(dir1, dir2):
+def find_unique_lines(dir1, dir2, watchlist_index=None):
     # Get list of files in dir1 and dir2
     files_in_dir1 = os.listdir(dir1)
     files_in_dir2 = os.listdir(dir2)
@@ -51,13 +53,32 @@ def find_unique_lines(dir1, dir2):
             print(line)
         print()  # Print an empty line for separation
 
+        if watchlist_index:
+            # Check the owner of every new line against the watchlist
+            owners = sorted({line.split()[0] for line in unique_lines if line and not line.startswith(';')})
+            print(f"Watchlist matches in {file2}:")
+            for owner in owners:
+                for term, reason in watchlist_index.match(owner):
+                    print(f"{owner} -> {term} ({reason})")
+            print()
+
 def main():
     parser = argparse.ArgumentParser(description='Compare gzipped domain files in two directories')
     parser.add_argument('dir1', help='Path to the first directory containing gzipped domain files')
     parser.add_argument('dir2', help='Path to the second directory containing gzipped domain files')
+    parser.add_argument('--watchlist', help='File of watched brand names to match new owners against')
+    parser.add_argument('-d', '--max-distance', type=int, default=1, help='Largest edit distance reported by --watchlist (default is 1)')
     args = parser.parse_args()
 
-    find_unique_lines(args.dir1, args.dir2)
+    watchlist_index = None
+    if args.watchlist:
+        try:
+            watchlist_index = load_index(args.watchlist, max_distance=args.max_distance)
+        except FileNotFoundError:
+            print(f"Error: File '{args.watchlist}' not found.")
+            return
+
+    find_unique_lines(args.dir1, args.dir2, watchlist_index)
 
 if __name__ == "__main__":
     main()
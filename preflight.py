@@ -0,0 +1,92 @@
+import hashlib
+import os
+import struct
+import zlib
+
+from zonereader import inflate_members
+
+# Bytes of inflated text searched for the SOA record at the head of a zone
+HEAD_LIMIT = 1 << 20
+BLOCK_SIZE = 1 << 20
+# Header, empty deflate block and trailer of the smallest possible member
+MIN_GZIP_SIZE = 20
+
+class CorruptFileError(Exception):
+    pass
+
+def check_gzip(filename):
+    """ Cheap structural checks that need no inflating: size, magic bytes, compression method and trailer.
+
+    The trailer check only works for files under about 4 MB. Past that, the
+    32-bit length read from the last bytes of a cut off file can be anything,
+    so a truncated large file passes here and is only caught by the parse.
+    """
+    size = os.path.getsize(filename)
+    if size == 0:
+        raise CorruptFileError(f"'{filename}' is empty")
+    with open(filename, 'rb') as file:
+        header = file.read(3)
+        if header[:2] != b'\x1f\x8b':
+            raise CorruptFileError(f"'{filename}' is not a gzip file")
+        if header[2:] != b'\x08' or size < MIN_GZIP_SIZE:
+            raise CorruptFileError(f"'{filename}' is corrupt")
+        file.seek(-8, os.SEEK_END)
+        isize = struct.unpack('<I', file.read(8)[4:])[0]
+    # A deflate stream can expand to at most about 1032 times its size, so a
+    # trailer claiming more than that is really the middle of a cut off member
+    if size * 1032 < 1 << 32 and isize > size * 1032:
+        raise CorruptFileError(f"'{filename}' is truncated")
+
+def read_soa_serial(filename):
+    """ Return the SOA serial from the head of a gzipped zone, inflating only as much as needed. """
+    text = b''
+    done = 0
+    try:
+        with open(filename, 'rb') as file:
+            for data in inflate_members(file, 1 << 16, 1 << 16):
+                text += data
+                end = text.rfind(b'\n') + 1
+                for line in text[done:end].split(b'\n'):
+                    fields = line.split()
+                    if len(fields) >= 7 and not line.startswith(b';') and fields[3].lower() == b'soa':
+                        return int(fields[6]) if fields[6].isdigit() else None
+                done = end
+                if len(text) >= HEAD_LIMIT:
+                    break
+    except EOFError:
+        raise CorruptFileError(f"'{filename}' is truncated")
+    except zlib.error as e:
+        raise CorruptFileError(f"'{filename}' is corrupt: {e}")
+    return None
+
+def fingerprint(filename):
+    """ Streaming SHA-256 of the compressed bytes. """
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as file:
+        for chunk in iter(lambda: file.read(BLOCK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def preflight_pair(file1, file2):
+    """ Cheaply decide whether a pair of snapshots needs a full diff.
+
+    Returns ('unchanged', serial) when both have the same SOA serial, size and
+    fingerprint, ('changed', None) when the full diff is needed, or
+    ('corrupt', message). Only the header, trailer and head of each file are
+    checked here, which misses a truncated file over about 4 MB and any
+    damage past the head. The CRC and length checks of the whole file happen
+    during the parse, which reads both files side by side and gives up on the
+    pair as soon as either fails them.
+    """
+    try:
+        check_gzip(file1)
+        check_gzip(file2)
+        serial1, serial2 = read_soa_serial(file1), read_soa_serial(file2)
+        if serial1 is not None and serial1 == serial2 and os.path.getsize(file1) == os.path.getsize(file2):
+            if fingerprint(file1) == fingerprint(file2):
+                return 'unchanged', serial1
+    except CorruptFileError as e:
+        return 'corrupt', str(e)
+    except FileNotFoundError as e:
+        return 'corrupt', f"File '{e.filename}' not found."
+    return 'changed', None
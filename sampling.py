@@ -0,0 +1,102 @@
+import math
+import os
+import random
+from collections import Counter
+
+import gzindex
+
+DEFAULT_BLOCK_SIZE = 1 << 20
+# Normal quantile for a two-sided 95% confidence interval
+Z_95 = 1.96
+
+def _pick(total, fraction, seed):
+    count = min(total, max(1, round(total * fraction)))
+    return sorted(random.Random(seed).sample(range(total), count))
+
+def plain_blocks(filename, fraction, block_size=DEFAULT_BLOCK_SIZE, seed=None):
+    """ Pick random line-aligned blocks of an uncompressed file by seeking.
+
+    Returns (blocks, total blocks, total bytes), where blocks is a list of
+    (bytes covered, lines) and a line belongs to the block it starts in.
+    """
+    size = os.path.getsize(filename)
+    total = max(1, math.ceil(size / block_size))
+    blocks = []
+    with open(filename, 'rb') as file:
+        for index in _pick(total, fraction, seed):
+            start = index * block_size
+            end = min(start + block_size, size)
+            if start:
+                # Skip the line that began in the previous block
+                file.seek(start - 1)
+                file.readline()
+            lines = []
+            while file.tell() < end:
+                line = file.readline()
+                if not line:
+                    break
+                lines.append(line.decode('utf-8'))
+            blocks.append((end - start, lines))
+    return blocks, total, size
+
+def gzip_blocks(filename, fraction, seed=None):
+    """ Pick random ranges between the access points of a gzindex sidecar, so nothing before them is inflated. """
+    points, size = gzindex.read_index(filename)
+    blocks = []
+    for index in _pick(len(points), fraction, seed):
+        end = points[index + 1].out if index + 1 < len(points) else size
+        blocks.append((end - points[index].out, list(gzindex.read_lines(filename, points, index, index + 1))))
+    return blocks, len(points), size
+
+def estimate_counts(blocks, total_blocks, total_bytes, key, keys=None):
+    """ Extrapolate per-key counts from sampled blocks with a ratio estimator.
+
+    key maps a record's fields to the value to count (or None). Returns
+    {value: (estimate, low, high)} with 95% confidence bounds, treating each
+    block as one cluster of a simple random sample.
+    """
+    per_block = []
+    for _, lines in blocks:
+        counts = Counter()
+        for line in lines:
+            if line.startswith(';'):
+                continue
+            fields = line.split()
+            if not fields:
+                continue
+            value = key(fields)
+            if value is not None:
+                counts[value] += 1
+        per_block.append(counts)
+
+    sizes = [size for size, _ in blocks]
+    sampled_bytes = sum(sizes)
+    n = len(blocks)
+    if keys is None:
+        keys = set().union(*per_block)
+
+    estimates = {}
+    for value in keys:
+        counts = [block[value] for block in per_block]
+        ratio = sum(counts) / sampled_bytes if sampled_bytes else 0
+        estimate = ratio * total_bytes
+        if n > 1 and n < total_blocks:
+            residuals = sum((count - ratio * size) ** 2 for count, size in zip(counts, sizes)) / (n - 1)
+            error = Z_95 * total_blocks * math.sqrt((1 - n / total_blocks) * residuals / n)
+        elif n == total_blocks:
+            error = 0
+        else:
+            error = math.inf
+        estimates[value] = (estimate, max(0, estimate - error), estimate + error)
+    return estimates
+
+def print_estimates(estimates, keys=None, limit=None):
+    keys = keys if keys is not None else sorted(estimates, key=lambda value: -estimates[value][0])
+    for value in keys[:limit]:
+        estimate, low, high = estimates[value]
+        print(f"{value}: ~{estimate:.0f} (95% CI {low:.0f}-{high:.0f})")
+
+def print_coverage(blocks, total_blocks, total_bytes):
+    read = sum(size for size, _ in blocks)
+    share = 100 * read / total_bytes if total_bytes else 100
+    print(f"\nSampled {len(blocks)} of {total_blocks} blocks: {read} of {total_bytes} bytes ({share:.1f}%)")
@@ -0,0 +1,281 @@
+import argparse
+import bisect
+import datetime
+import gzip
+import heapq
+import json
+import os
+import re
+
+from compactset import CompactSet
+from zonereader import read_records
+
+MANIFEST = 'manifest.json'
+# Every INDEX_INTERVAL-th key of a segment goes into its sparse index
+INDEX_INTERVAL = 128
+# Compact once this many segments have piled up
+MAX_SEGMENTS = 8
+FILE_DATE = re.compile(r'(\d{4})(\d{2})(\d{2})')
+
+def snapshot_date(filename):
+    """ The date stamp in a snapshot's file name, falling back to its modification date. """
+    match = FILE_DATE.search(os.path.basename(filename))
+    if match:
+        return datetime.date(*map(int, match.groups())).isoformat()
+    return datetime.date.fromtimestamp(os.path.getmtime(filename)).isoformat()
+
+class Segment:
+    """ An immutable sorted file of owner records with a sparse offset index.
+
+    Each line is owner, first_seen, run_start, prior, last_seen separated by
+    tabs. An owner present in the latest snapshot has an open run: run_start
+    is the sequence number of the snapshot the run began in and last_seen is
+    '-'. A closed run has run_start '-' and prior counts every sighting.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.keys = []
+        self.offsets = []
+        with open(path + '.idx', 'r', encoding='utf-8') as file:
+            for line in file:
+                key, offset = line.rstrip('\n').split('\t')
+                self.keys.append(key)
+                self.offsets.append(int(offset))
+        self._block = (None, [])
+
+    @staticmethod
+    def write(path, records):
+        """ Write (owner, record) pairs, already sorted by owner, and their index. """
+        with open(path, 'w', encoding='utf-8', newline='\n') as file, \
+                open(path + '.idx', 'w', encoding='utf-8', newline='\n') as index:
+            offset = 0
+            for count, (owner, record) in enumerate(records):
+                if count % INDEX_INTERVAL == 0:
+                    index.write(f"{owner}\t{offset}\n")
+                line = '\t'.join((owner,) + record) + '\n'
+                file.write(line)
+                offset += len(line.encode('utf-8'))
+
+    def _read_block(self, block):
+        if self._block[0] != block:
+            with open(self.path, 'rb') as file:
+                file.seek(self.offsets[block])
+                end = self.offsets[block + 1] if block + 1 < len(self.offsets) else None
+                data = file.read(end - self.offsets[block] if end is not None else -1)
+            # Owners are plain text, so only '\n' ends a line; the block ends with one
+            lines = [line.split('\t') for line in data.decode('utf-8').split('\n')[:-1]]
+            self._block = (block, [(fields[0], tuple(fields[1:])) for fields in lines])
+        return self._block[1]
+
+    def get(self, owner):
+        block = bisect.bisect_right(self.keys, owner) - 1
+        if block < 0:
+            return None
+        records = self._read_block(block)
+        i = bisect.bisect_left(records, (owner,))
+        if i < len(records) and records[i][0] == owner:
+            return records[i][1]
+        return None
+
+    def scan(self, prefix=''):
+        """ Iterate over (owner, record) in order, starting at the first owner >= prefix and stopping past it. """
+        block = max(0, bisect.bisect_left(self.keys, prefix) - 1)
+        for block in range(block, len(self.keys)):
+            for owner, record in self._read_block(block):
+                if owner < prefix:
+                    continue
+                if not owner.startswith(prefix):
+                    return
+                yield owner, record
+
+class SeenDatabase:
+    """ Owner name to (first_seen, last_seen, times_seen) across a series of snapshots.
+
+    Updates only write records for owners that appeared or disappeared since
+    the previous snapshot; owners still present keep their open run, and
+    last_seen and times_seen are derived from it at lookup time.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, MANIFEST)
+        if os.path.exists(path):
+            with open(path, 'r') as file:
+                self.manifest = json.load(file)
+        else:
+            self.manifest = {'dates': [], 'segments': [], 'present': None, 'next_id': 1}
+        # Newest first, which is the order lookups search in
+        self.segments = [Segment(os.path.join(directory, name)) for name in reversed(self.manifest['segments'])]
+
+    def _save_manifest(self):
+        path = os.path.join(self.directory, MANIFEST)
+        with open(path + '.tmp', 'w') as file:
+            json.dump(self.manifest, file)
+        os.replace(path + '.tmp', path)
+
+    def _new_name(self, kind):
+        name = f"{kind}-{self.manifest['next_id']:06d}"
+        self.manifest['next_id'] += 1
+        return name
+
+    def _present(self):
+        if not self.manifest['present']:
+            return
+        with gzip.open(os.path.join(self.directory, self.manifest['present']), 'rt', encoding='utf-8') as file:
+            for line in file:
+                yield line.rstrip('\n')
+
+    def get_record(self, owner):
+        for segment in self.segments:
+            record = segment.get(owner)
+            if record is not None:
+                return record
+        return None
+
+    def _resolve(self, record):
+        first, run_start, prior, last = record
+        if run_start == '-':
+            return first, last, int(prior)
+        dates = self.manifest['dates']
+        return first, dates[-1], int(prior) + len(dates) - int(run_start)
+
+    def _merged(self, prefix=''):
+        """ Merge the segments in owner order, keeping only the newest record of each owner. """
+        def tagged(age, segment):
+            for owner, record in segment.scan(prefix):
+                yield owner, age, record
+
+        previous = None
+        # For equal owners the newest segment (lowest age) sorts first
+        for owner, _, record in heapq.merge(*(tagged(age, segment) for age, segment in enumerate(self.segments))):
+            if owner != previous:
+                previous = owner
+                yield owner, record
+
+    def lookup(self, owner):
+        """ Return (first_seen, last_seen, times_seen) for an owner, or None if it was never seen. """
+        record = self.get_record(owner.lower())
+        return self._resolve(record) if record else None
+
+    def prefix(self, prefix):
+        """ Iterate over (owner, first_seen, last_seen, times_seen) for every owner starting with prefix. """
+        prefix = prefix.lower()
+        for owner, record in self._merged(prefix):
+            yield (owner,) + self._resolve(record)
+
+    def update(self, filename, date=None):
+        """ Fold a new snapshot into the database; it must be newer than the last one. """
+        date = date or snapshot_date(filename)
+        dates = self.manifest['dates']
+        if dates and date <= dates[-1]:
+            raise ValueError(f"snapshot date {date} is not after the last update {dates[-1]}")
+
+        owners = CompactSet()
+        previous = None
+        for fields in read_records(filename):
+            # A zone lists all records of an owner together, so most repeats
+            # are caught here without hashing into the set
+            if fields[0] != previous:
+                previous = fields[0]
+                owners.add(previous.lower())
+
+        sequence = len(dates)
+        present_name = self._new_name('present') + '.gz'
+        changes = []
+        with gzip.open(os.path.join(self.directory, present_name), 'wt', encoding='utf-8', newline='\n') as present:
+            for owner, added in _merge_changes(self._present(), owners.sorted(), present):
+                record = self.get_record(owner)
+                if added:
+                    if record is None:
+                        changes.append((owner, (date, str(sequence), '0', '-')))
+                    else:
+                        changes.append((owner, (record[0], str(sequence), record[2], '-')))
+                else:
+                    first, run_start, prior, _ = record
+                    total = int(prior) + sequence - int(run_start)
+                    changes.append((owner, (first, '-', str(total), dates[-1])))
+
+        segment_name = self._new_name('segment') + '.tsv'
+        Segment.write(os.path.join(self.directory, segment_name), changes)
+
+        old_present = self.manifest['present']
+        dates.append(date)
+        self.manifest['segments'].append(segment_name)
+        self.manifest['present'] = present_name
+        self._save_manifest()
+        self.segments.insert(0, Segment(os.path.join(self.directory, segment_name)))
+        if old_present:
+            os.remove(os.path.join(self.directory, old_present))
+
+        if len(self.segments) > MAX_SEGMENTS:
+            self.compact()
+        return sum(1 for _, record in changes if record[1] != '-'), sum(1 for _, record in changes if record[1] == '-')
+
+    def compact(self):
+        """ Merge every segment into one, keeping the newest record of each owner. """
+        if len(self.segments) < 2:
+            return
+        segment_name = self._new_name('segment') + '.tsv'
+        Segment.write(os.path.join(self.directory, segment_name), self._merged())
+
+        old_segments = self.manifest['segments']
+        self.manifest['segments'] = [segment_name]
+        self._save_manifest()
+        self.segments = [Segment(os.path.join(self.directory, segment_name))]
+        for name in old_segments:
+            os.remove(os.path.join(self.directory, name))
+            os.remove(os.path.join(self.directory, name + '.idx'))
+
+def _merge_changes(old, new, present):
+    """ Walk two sorted owner streams, writing the new one to present and yielding (owner, added) for each difference. """
+    old, new = iter(old), iter(new)
+    old_owner, new_owner = next(old, None), next(new, None)
+    while old_owner is not None or new_owner is not None:
+        if new_owner is not None and (old_owner is None or new_owner < old_owner):
+            present.write(new_owner + '\n')
+            yield new_owner, True
+            new_owner = next(new, None)
+        elif new_owner is None or old_owner < new_owner:
+            yield old_owner, False
+            old_owner = next(old, None)
+        else:
+            present.write(new_owner + '\n')
+            old_owner, new_owner = next(old, None), next(new, None)
+
+def main():
+    parser = argparse.ArgumentParser(description='Track when each owner name was first and last seen across zone snapshots')
+    parser.add_argument('database', help='Directory holding the database')
+    parser.add_argument('-u', '--update', nargs='+', metavar='FILE', help='Gzipped snapshots to add, oldest first')
+    parser.add_argument('--date', help='Snapshot date as YYYY-MM-DD (default is the date stamp in the file name)')
+    parser.add_argument('-l', '--lookup', nargs='+', metavar='NAME', help='Print first seen, last seen and times seen for these names')
+    parser.add_argument('-p', '--prefix', help='Print every name starting with this prefix')
+    parser.add_argument('--compact', action='store_true', help='Merge all segments into one')
+    args = parser.parse_args()
+
+    database = SeenDatabase(args.database)
+
+    for filename in args.update or []:
+        try:
+            added, removed = database.update(filename, args.date)
+            print(f"{filename}: {added} names appeared, {removed} disappeared")
+        except FileNotFoundError:
+            print(f"Error: File '{filename}' not found.")
+        except ValueError as e:
+            print(f"Error: {e}")
+    if args.compact:
+        database.compact()
+
+    for name in args.lookup or []:
+        result = database.lookup(name)
+        if result:
+            print(f"{name}: first seen {result[0]}, last seen {result[1]}, seen {result[2]} times")
+        else:
+            print(f"{name}: never seen")
+    if args.prefix:
+        for owner, first, last, times in database.prefix(args.prefix):
+            print(f"{owner}\t{first}\t{last}\t{times}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import gzip
+import ipaddress
+import socket
+import struct
+import sys
+import threading
+
+import pytest
+
+import axfr
+from axfr import encode_name
+
+ZONE = 'example.'
+
+def rr(owner, rtype, ttl, rdata):
+    return encode_name(owner) + struct.pack('!HHIH', rtype, 1, ttl, len(rdata)) + rdata
+
+def soa(serial):
+    rdata = encode_name('ns1.example.') + encode_name('host.example.') + struct.pack('!5I', serial, 7200, 900, 1209600, 300)
+    return rr(ZONE, 6, 3600, rdata)
+
+def ns(owner, host):
+    return rr(owner, 2, 172800, encode_name(host))
+
+def a(owner, address):
+    return rr(owner, 1, 3600, ipaddress.IPv4Address(address).packed)
+
+# Serial 2 of the zone; serial 1 had old.example. instead of the glue of ns.foo.example.
+RECORDS = [
+    ns(ZONE, 'ns1.example.'),
+    ns('foo.example.', 'ns.foo.example.'),
+    a('ns.foo.example.', '192.0.2.1'),
+    rr('foo.example.', 43, 86400, struct.pack('!HBB', 1234, 8, 2) + bytes.fromhex('ab' * 32)),
+    rr('t.example.', 16, 300, b'\x05hello\x03a"b'),
+    rr('u.example.', 99, 300, b'\x01\x02'),
+]
+
+class StandInServer:
+    """ Local stand-in for an authoritative primary: answers AXFR and IXFR for example. over TCP. """
+
+    def __init__(self, serial=2):
+        self.serial = serial
+        self.malformed = False
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen()
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            with conn:
+                self._answer(conn)
+
+    def _answer(self, conn):
+        length = struct.unpack('!H', conn.recv(2))[0]
+        query = b''
+        while len(query) < length:
+            query += conn.recv(length - len(query))
+        query_id = struct.unpack_from('!H', query)[0]
+        question_end = 12 + len(encode_name(ZONE)) + 4
+        question = query[12:question_end]
+        query_type = struct.unpack_from('!H', query, question_end - 4)[0]
+
+        if query_type == 252:
+            messages = [[soa(self.serial)] + RECORDS[:3], RECORDS[3:] + [soa(self.serial)]]
+        else:
+            # The client's SOA sits in the authority section at the end of the query
+            client_serial = struct.unpack_from('!I', query, len(query) - 20)[0]
+            if client_serial == self.serial:
+                messages = [[soa(self.serial)]]
+            else:
+                messages = [[soa(2), soa(1), a('old.example.', '192.0.2.9')],
+                            [soa(2), a('ns.foo.example.', '192.0.2.1'), soa(2)]]
+
+        for records in messages:
+            data = struct.pack('!HHHHHH', query_id, 0x8400, 1, len(records), 0, 0) + question + b''.join(records)
+            if self.malformed:
+                # Claims more records than it carries
+                data = data[:-7]
+            conn.sendall(struct.pack('!H', len(data)) + data)
+
+    def close(self):
+        self.sock.close()
+
+@pytest.fixture
+def server():
+    standin = StandInServer()
+    yield standin
+    standin.close()
+
+def full_zone(server):
+    return set(axfr.full_lines(axfr.transfer('127.0.0.1', ZONE, server.port, timeout=5)))
+
+def write_previous(path, serial, separator=' ', lowercase=False):
+    # An archive as another tool would write it: uppercase types, its own
+    # spacing, a DS digest split in two; or all lowercase like the zone files
+    lines = [separator.join([ZONE, '3600', 'IN', 'SOA', 'NS1.example.', 'host.example.', str(serial), '7200', '900', '1209600', '300']),
+             separator.join([ZONE, '172800', 'IN', 'NS', 'ns1.example.']),
+             separator.join(['foo.example.', '172800', 'IN', 'NS', 'ns.foo.example.']),
+             separator.join(['old.example.', '3600', 'IN', 'A', '192.0.2.9']),
+             separator.join(['foo.example.', '86400', 'IN', 'DS', '1234', '8', '2', 'AB' * 16, 'AB' * 16]),
+             't.example.  300  IN  TXT  "hello" "a\\"b"',
+             separator.join(['u.example.', '300', 'IN', 'TYPE99', '\\#', '2', '0102'])]
+    if lowercase:
+        lines = [line.lower() if ' TXT ' not in line else line.replace('IN  TXT', 'in  txt') for line in lines]
+    with gzip.open(path, 'wt') as file:
+        file.write('\n'.join(lines) + '\n')
+
+def test_axfr(server):
+    lines = full_zone(server)
+    assert len(lines) == len(RECORDS) + 1
+    assert 'ns.foo.example.\t3600\tin\ta\t192.0.2.1' in lines
+    assert 'foo.example.\t86400\tin\tds\t1234 8 2 ' + 'ab' * 32 in lines
+
+def test_ixfr_current(server):
+    assert axfr.ixfr('127.0.0.1', ZONE, 2, server.port, timeout=5) == ('current', None)
+
+@pytest.mark.parametrize('lowercase', [False, True])
+def test_ixfr_applies_to_foreign_archive(server, tmp_path, lowercase):
+    previous = tmp_path / 'previous.gz'
+    write_previous(previous, 1, lowercase=lowercase)
+    state, serial = axfr.load_state(str(previous))
+    assert serial == 1
+
+    kind, deltas = axfr.ixfr('127.0.0.1', ZONE, serial, server.port, timeout=5)
+    assert kind == 'incremental'
+    new_state = set(state)
+    for deleted, added in deltas:
+        new_state.difference_update(deleted)
+        new_state.update(added)
+
+    assert new_state == full_zone(server)
+
+@pytest.mark.parametrize('lowercase', [False, True])
+@pytest.mark.parametrize('incremental', [False, True])
+def test_cli_diff_against_previous(server, tmp_path, monkeypatch, capsys, lowercase, incremental):
+    previous = tmp_path / 'previous.gz'
+    write_previous(previous, 1, separator='\t', lowercase=lowercase)
+    argv = ['axfr.py', '127.0.0.1', ZONE, '-p', str(server.port), '--previous', str(previous)]
+    monkeypatch.setattr(sys, 'argv', argv + ['--ixfr'] if incremental else argv)
+    axfr.main()
+
+    output = capsys.readouterr().out
+    added = output.split('Added Records:')[1].split('Deleted Records:')[0]
+    deleted = output.split('Deleted Records:')[1].split('\n\n')[1]
+    # Only the SOA, the removed address and the new glue changed
+    assert sorted(line.split('\t')[0] for line in added.split('\n') if line) == [ZONE, 'ns.foo.example.']
+    assert sorted(line.split('\t')[0] for line in deleted.split('\n') if line) == [ZONE, 'old.example.']
+
+def test_malformed_response(server):
+    server.malformed = True
+    with pytest.raises(axfr.TransferError):
+        full_zone(server)
@@ -0,0 +1,63 @@
+import gzip
+
+import checkdnsdir
+import zonereader
+
+def zone_text(serial, owners, extra=''):
+    head = f"example.\t3600\tin\tsoa\tns1.example. host.example. {serial} 7200 900 1209600 300\n"
+    return (head + ''.join(f"{owner}\t172800\tin\tns\tns1.example.\n" for owner in owners) + extra).encode('utf-8')
+
+def test_preflight_prefetch_compare(tmp_path, monkeypatch, capsys):
+    # Prefetching only starts reader threads with a CPU to spare; force it on
+    monkeypatch.setattr(zonereader, 'THREADED', True)
+    old, new = tmp_path / 'old', tmp_path / 'new'
+    old.mkdir()
+    new.mkdir()
+    same = gzip.compress(zone_text(5, ['a.example.', 'b.example.']))
+    (old / 'a.gz').write_bytes(same)
+    (new / 'a.gz').write_bytes(same)
+    (old / 'b.gz').write_bytes(gzip.compress(zone_text(1, ['a.example.', 'b.example.'])))
+    (new / 'b.gz').write_bytes(gzip.compress(zone_text(2, ['a.example.', 'c.example.'], 'c.example.\t3600\tin\tds\t1 8 2 ab\n')))
+    good = gzip.compress(zone_text(1, ['d.example.']))
+    (old / 'c.gz').write_bytes(good)
+    (new / 'c.gz').write_bytes(good[:len(good) - 6])
+    (old / 'd.gz').write_bytes(gzip.compress(zone_text(1, [f"{i}.example." for i in range(1000)])))
+    (new / 'd.gz').write_bytes(gzip.compress(zone_text(2, [f"{i}.example." for i in range(1, 1000)])))
+
+    checkdnsdir.process_directories(str(old), str(new), 1)
+    output = capsys.readouterr().out
+
+    assert f"Unchanged: {old / 'a.gz'} and {new / 'a.gz'} have SOA serial 5" in output
+    assert f"Error: '{new / 'c.gz'}' is truncated" in output
+    # Only the changed pairs are parsed
+    compared = [line for line in output.split('\n') if line.startswith('Comparing files')]
+    assert compared == [f"Comparing files: {old / 'b.gz'} and {new / 'b.gz'}", f"Comparing files: {old / 'd.gz'} and {new / 'd.gz'}"]
+    assert f"Unique field values in {old / 'b.gz'} but not in {new / 'b.gz'}:\nb.example.\n" in output
+    assert f"ds: {old / 'b.gz'}=0, {new / 'b.gz'}=1" in output
+    assert f"Unique field values in {old / 'd.gz'} but not in {new / 'd.gz'}:\n0.example.\n" in output
+    # No reader threads are left behind for files nobody read
+    assert zonereader._prefetched == {}
+
+def test_corrupt_file_stops_pair_early(tmp_path, monkeypatch, capsys):
+    owners = [f"{i}.example." for i in range(200000)]
+    file1 = tmp_path / 'old.gz'
+    file1.write_bytes(gzip.compress(zone_text(1, owners)))
+    # The first member of file2 fails its CRC check, long before file2 ends
+    damaged = bytearray(gzip.compress(zone_text(2, owners[:10])))
+    damaged[-8] ^= 0xff
+    file2 = tmp_path / 'new.gz'
+    file2.write_bytes(bytes(damaged) + gzip.compress(zone_text(2, owners)))
+
+    read = {}
+    def counting_read_records(filename, with_lines=False):
+        for fields in zonereader.read_records(filename, with_lines):
+            read[filename] = read.get(filename, 0) + 1
+            yield fields
+    monkeypatch.setattr(checkdnsdir, 'read_records', counting_read_records)
+
+    checkdnsdir.compare_files(str(file1), str(file2), 1, preflight=False)
+    output = capsys.readouterr().out
+
+    assert f"Error: File '{file2}' is truncated or corrupt" in output
+    assert 'Unique field values' not in output
+    assert read[str(file1)] <= checkdnsdir.SCAN_BATCH
@@ -0,0 +1,78 @@
+import gzip
+
+import pytest
+
+import gpt4dns
+from gpt4dns import QueryIndex, compile_query, load_queries
+
+RECORDS = [
+    'example.\t3600\tin\tsoa\tns1.example. host.example. 1 7200 900 1209600 300',
+    'example.\t172800\tin\tns\tns1.example.',
+    'Foo.Example.\t172800\tin\tns\tNS.foo.example.',
+    'afoo.example.\t172800\tin\tns\tns1.other.',
+    'ns.foo.example.\t3600\tin\ta\t192.0.2.1',
+    'bar.example.\t86400\tin\tds\t1234 8 2 ABCD',
+    'example.net.\t300\tin\ttxt\t"hello"',
+]
+
+QUERIES = [
+    'type=ns',
+    'owner=.example.',
+    'owner=foo.example.',
+    'owner=ample.',
+    'owner=example',
+    'rdata=ns1.example.',
+    'rdata=NS.foo.example. type=ns,ds',
+    'owner~^foo\\. ttl=100000-200000',
+    'owner~(a)\\1|^bar',
+    'rdata~hello',
+    'rdata~(?i)ns\\d',
+    'type=a,aaaa owner=.example. rdata~^192\\.',
+    'owner=.example. owner~^ns rdata=192.0.2.1',
+    'ttl=300',
+]
+
+def brute_force(text, fields):
+    # Straight reading of the query language, one term at a time
+    record_types, terms = compile_query(text)
+    if record_types is not None and fields[3].lower() not in record_types:
+        return False
+    rdata = ' '.join(fields[4:])
+    for key, op, value in terms:
+        if key == 'ttl':
+            ok = fields[1].isdigit() and value[0] <= int(fields[1]) <= value[1]
+        elif op == '~':
+            ok = value.search(fields[0] if key == 'owner' else rdata) is not None
+        elif key == 'owner':
+            ok = fields[0].lower().endswith(value)
+        else:
+            ok = rdata.lower() == value
+        if not ok:
+            return False
+    return True
+
+def test_index_matches_every_query():
+    queries = [(f"q{i}", *compile_query(text)) for i, text in enumerate(QUERIES)]
+    index = QueryIndex(queries)
+    for line in RECORDS:
+        fields = line.split()
+        expected = [i for i, text in enumerate(QUERIES) if brute_force(text, fields)]
+        assert sorted(index.matches(fields)) == expected, line
+
+def test_duplicate_names(tmp_path):
+    path = tmp_path / 'queries.txt'
+    path.write_text('ns: type=ns\n# comment\nns: type=a\n')
+    with pytest.raises(ValueError, match="line 3: duplicate query name 'ns'"):
+        load_queries(str(path))
+
+def test_run_queries_streams(tmp_path, capsys):
+    zone = tmp_path / 'zone.gz'
+    with gzip.open(zone, 'wt') as file:
+        file.write('\n'.join(RECORDS) + '\n')
+    queries = tmp_path / 'queries.txt'
+    queries.write_text('ns: type=ns\nfoo: owner=foo.example.\n')
+
+    gpt4dns.run_queries(str(zone), str(queries))
+    output = capsys.readouterr().out
+    assert output == ("\nQuery 'ns': 3 records\n\n" + '\n'.join(RECORDS[1:4]) + '\n'
+                      "\nQuery 'foo': 3 records\n\n" + '\n'.join(RECORDS[2:5]) + '\n')
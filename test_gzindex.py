@@ -0,0 +1,53 @@
+import gzip
+from collections import Counter
+
+import gzindex
+import heavyhitters
+
+TYPES = ['ns', 'a', 'ds', 'rrsig']
+
+def zone_lines(start, count):
+    return [f"d{i:07d}.com.\t172800\tin\t{TYPES[i % 7 % 4]}\tns{i % 13}.example.net." for i in range(start, start + count)]
+
+def write_multi_member(path):
+    # Sorted records spread over members of different sizes, with a comment
+    # and zero padding thrown in
+    lines = zone_lines(0, 120000)
+    members = [lines[:50000], lines[50000:50001], lines[50001:]]
+    data = b''.join(gzip.compress(('\n'.join(member) + '\n').encode('utf-8')) for member in members)
+    path.write_bytes(gzip.compress(b'; generated\n') + data + b'\x00' * 16)
+    return lines
+
+def test_multi_member_round_trip(tmp_path):
+    path = tmp_path / 'zone.gz'
+    lines = write_multi_member(path)
+    filename = str(path)
+    points, size = gzindex.build_index(filename, 1 << 18)
+    gzindex.write_index(filename, points, size)
+
+    points, _ = gzindex.read_index(filename)
+    assert len(points) > 4
+    expected = Counter(line.split()[3] for line in lines)
+
+    # Whole file against the sum of the ranges the workers are given
+    ranges = Counter()
+    for start in range(len(points)):
+        end = points[start + 1].out if start + 1 < len(points) else None
+        ranges.update(gzindex._count_range(filename, points[start], end))
+    assert ranges == expected
+    assert list(gzindex.read_lines(filename, points, 0, len(points))) == ['; generated'] + lines
+    assert gzindex.count_record_types(filename, workers=2) == expected
+
+    assert list(gzindex.lookup(filename, 'd00500')) == [line for line in lines if line.startswith('d00500')]
+    assert list(gzindex.lookup(filename, 'd0119999')) == lines[-1:]
+    assert list(gzindex.lookup(filename, 'e')) == []
+
+def test_heavy_hitters_over_ranges(tmp_path):
+    path = tmp_path / 'zone.gz'
+    lines = write_multi_member(path)
+    filename = str(path)
+    points, size = gzindex.build_index(filename, 1 << 18)
+    gzindex.write_index(filename, points, size)
+
+    expected = Counter(line.split()[4] for line in lines if line.split()[3] == 'ns')
+    assert sorted(heavyhitters.top_heavy_hitters([filename], 'ns', 13, exact=True, workers=3)) == sorted(expected.items())
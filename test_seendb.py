@@ -0,0 +1,66 @@
+import gzip
+import os
+
+import seendb
+from seendb import SeenDatabase, Segment
+
+def write_snapshot(directory, date, owners):
+    path = os.path.join(directory, f"com-{date.replace('-', '')}.gz")
+    with gzip.open(path, 'wt', encoding='utf-8') as file:
+        for owner in owners:
+            file.write(f"{owner}\t172800\tin\tns\tns1.example.net.\n{owner}\t86400\tin\tds\t1 8 2 ab\n")
+    return path
+
+def test_segment(tmp_path, monkeypatch):
+    monkeypatch.setattr(seendb, 'INDEX_INTERVAL', 4)
+    # U+0085 is a line break to str.splitlines but not in a segment
+    owners = sorted([f"d{i:03d}.com." for i in range(30)] + ['d010\x85x.com.', 'd020 y.com.'])
+    path = str(tmp_path / 'segment.tsv')
+    Segment.write(path, [(owner, ('2026-01-01', '-', str(i), '2026-01-02')) for i, owner in enumerate(owners)])
+
+    segment = Segment(path)
+    assert len(segment.keys) == 8
+    for i, owner in enumerate(owners):
+        assert segment.get(owner) == ('2026-01-01', '-', str(i), '2026-01-02')
+    assert segment.get('a.com.') is None
+    assert segment.get('d0105.com.') is None
+    assert segment.get('z.com.') is None
+    assert [owner for owner, _ in segment.scan('d01')] == [owner for owner in owners if owner.startswith('d01')]
+    assert [owner for owner, _ in segment.scan()] == owners
+
+def test_open_runs(tmp_path):
+    database = SeenDatabase(str(tmp_path / 'db'))
+    assert database.update(write_snapshot(str(tmp_path), '2026-01-01', ['a.com.', 'B.com.'])) == (2, 0)
+    assert database.update(write_snapshot(str(tmp_path), '2026-01-02', ['a.com.', 'c.com.'])) == (1, 1)
+    assert database.update(write_snapshot(str(tmp_path), '2026-01-03', ['a.com.', 'b.com.'])) == (1, 1)
+
+    assert database.lookup('A.com.') == ('2026-01-01', '2026-01-03', 3)
+    assert database.lookup('b.com.') == ('2026-01-01', '2026-01-03', 2)
+    assert database.lookup('c.com.') == ('2026-01-02', '2026-01-02', 1)
+    assert database.lookup('d.com.') is None
+    # Only owners that came or went were written
+    assert [len(list(segment.scan())) for segment in database.segments] == [2, 2, 2]
+
+    reopened = SeenDatabase(str(tmp_path / 'db'))
+    assert list(reopened.prefix('')) == [('a.com.', '2026-01-01', '2026-01-03', 3),
+                                         ('b.com.', '2026-01-01', '2026-01-03', 2),
+                                         ('c.com.', '2026-01-02', '2026-01-02', 1)]
+
+def test_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(seendb, 'MAX_SEGMENTS', 2)
+    database = SeenDatabase(str(tmp_path / 'db'))
+    snapshots = [['a.com.', 'b.com.'], ['b.com.'], ['a.com.', 'c.com.'], ['c.com.']]
+    for day, owners in enumerate(snapshots, 1):
+        database.update(write_snapshot(str(tmp_path), f"2026-01-0{day}", owners))
+        assert len(database.segments) <= 2
+
+    expected = [('a.com.', '2026-01-01', '2026-01-03', 2),
+                ('b.com.', '2026-01-01', '2026-01-02', 2),
+                ('c.com.', '2026-01-03', '2026-01-04', 2)]
+    assert list(database.prefix('')) == expected
+
+    database.compact()
+    assert len(database.segments) == 1
+    assert sorted(name for name in os.listdir(str(tmp_path / 'db')) if name.startswith('segment')) == [
+        database.manifest['segments'][0], database.manifest['segments'][0] + '.idx']
+    assert list(SeenDatabase(str(tmp_path / 'db')).prefix('')) == expected
@@ -0,0 +1,50 @@
+import gzip
+import os
+
+from watchdrops import DropWatcher
+
+def write_drop(path, records, mtime):
+    with gzip.open(path, 'wt') as file:
+        for owner, record_type, rdata in records:
+            file.write(f"{owner}\t3600\tin\t{record_type}\t{rdata}\n")
+    os.utime(path, ns=(mtime, mtime))
+
+def test_previous_drop_deleted(tmp_path, capsys):
+    old = tmp_path / 'com-20260101.gz'
+    new = tmp_path / 'com-20260102.gz'
+    write_drop(old, [('a.com.', 'ns', 'ns1.x.')], 1_000_000_000_000_000_000)
+    watcher = DropWatcher(4)
+    watcher.seed(str(tmp_path))
+
+    # Retention cleanup removes the previous drop before the next one lands
+    old.unlink()
+    write_drop(new, [('a.com.', 'ns', 'ns1.x.'), ('b.com.', 'ds', '1 8 2 ab')], 1_000_000_100_000_000_000)
+    assert watcher.process(str(new))
+
+    output = capsys.readouterr().out
+    assert f"{old} -> {new}" in output
+    assert '+ds' in output
+    assert watcher.state['com'][0] == str(new)
+
+def test_drop_rewritten_in_place(tmp_path, capsys):
+    path = tmp_path / 'com.zone.gz'
+    write_drop(path, [('a.com.', 'ns', 'ns1.x.')], 1_000_000_000_000_000_000)
+    watcher = DropWatcher(4)
+    watcher.seed(str(tmp_path))
+    assert watcher.process(str(path))
+    assert 'Summary' not in capsys.readouterr().out
+
+    write_drop(path, [('a.com.', 'ns', 'ns1.x.'), ('a.com.', 'ds', '1 8 2 ab')], 1_000_000_100_000_000_000)
+    assert watcher.process(str(path))
+    output = capsys.readouterr().out
+    assert 'Summary of changes for com.zone' in output
+    assert '+ds' in output
+
+    # The same file again is not diffed twice
+    assert watcher.process(str(path))
+    assert 'Summary' not in capsys.readouterr().out
+
+def test_missing_new_drop_is_skipped(tmp_path, capsys):
+    watcher = DropWatcher(4)
+    assert watcher.process(str(tmp_path / 'com-20260103.gz'))
+    assert watcher.state == {}
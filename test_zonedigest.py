@@ -0,0 +1,32 @@
+import random
+
+from zonedigest import _in_ranges, build_leaves, build_tree, changed_ranges, extend_tree
+
+def test_extended_tree_matches_tall_build():
+    leaves = build_leaves({f"d{i:06d}.com.": i for i in range(3000)})
+    levels = build_tree(leaves)
+    extend_tree(levels, len(levels) + 2)
+    tall = build_tree(leaves, len(levels))
+    assert [[(node.start, node.end, node.digest, node.children) for node in level] for level in levels] == \
+           [[(node.start, node.end, node.digest, node.children) for node in level] for level in tall]
+
+def test_changed_ranges_cover_every_change():
+    rng = random.Random(5)
+    small = {f"d{i:06d}.com.": rng.getrandbits(64) for i in range(600)}
+    # A zone with many more owners builds a taller tree than the small one
+    large = dict(small)
+    large.update((f"e{i:06d}.com.", rng.getrandbits(64)) for i in range(100000))
+    for owner in rng.sample(sorted(small), 2):
+        large[owner] += 1
+    del large['d000100.com.']
+
+    leaves1, leaves2 = build_leaves(small), build_leaves(large)
+    assert len(build_tree(leaves1)) < len(build_tree(leaves2))
+
+    ranges = changed_ranges(leaves1, leaves2)
+    starts = [start for start, _ in ranges]
+    changed = {owner for owner in set(small) | set(large) if small.get(owner) != large.get(owner)}
+    assert all(_in_ranges(owner, starts, ranges) for owner in changed)
+    # Unchanged owners mostly stay out of the ranges
+    assert sum(_in_ranges(owner, starts, ranges) for owner in small if owner not in changed) < len(small) // 2
+    assert changed_ranges(build_leaves(large), build_leaves(large)) == []
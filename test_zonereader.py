@@ -0,0 +1,37 @@
+import gzip
+import zlib
+
+import pytest
+
+from zonereader import read_records
+
+def zone_text(prefix, count):
+    return ''.join(f"{prefix}{i}.com.\t3600\tin\tns\tns{i % 7}.example.net.\n" for i in range(count)).encode('utf-8')
+
+def test_multi_member(tmp_path):
+    # Members large enough to end in the middle of a capped inflate call
+    first, second = zone_text('a', 200000), zone_text('b', 200000)
+    path = tmp_path / 'multi.gz'
+    path.write_bytes(gzip.compress(first) + gzip.compress(b'; comment\n\n') + gzip.compress(second) + b'\x00' * 8)
+
+    owners = [fields[0] for fields in read_records(str(path))]
+    assert owners == [line.split()[0] for line in (first + second).decode('utf-8').splitlines()]
+
+def test_truncated(tmp_path):
+    data = gzip.compress(zone_text('a', 50000))
+    path = tmp_path / 'truncated.gz'
+    path.write_bytes(gzip.compress(zone_text('b', 10)) + data[:len(data) // 2])
+
+    with pytest.raises(EOFError):
+        for _ in read_records(str(path)):
+            pass
+
+def test_bad_crc(tmp_path):
+    data = bytearray(gzip.compress(zone_text('a', 1000)))
+    data[-8] ^= 0xff
+    path = tmp_path / 'crc.gz'
+    path.write_bytes(bytes(data))
+
+    with pytest.raises(zlib.error):
+        for _ in read_records(str(path)):
+            pass
@@ -0,0 +1,214 @@
+import argparse
+import ctypes
+import ctypes.util
+import os
+import re
+import struct
+import time
+import zlib
+
+from zonereader import read_records
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+# Date stamps in drop names, e.g. com-20261019.txt.gz or com.zone.20261019T0300.gz
+DATE_STAMP = re.compile(r'[-_.]?\d{8}(?:T?\d{4,6})?')
+
+def zone_key(path):
+    name = os.path.basename(path)[:-len('.gz')]
+    return DATE_STAMP.sub('', name) or name
+
+def load_snapshot(filename, field_num):
+    """ Parse a zone drop once into its unique field values and record type counts. """
+    field_values = set()
+    record_types = {}
+    for fields in read_records(filename):
+        if len(fields) >= field_num:
+            field_values.add(fields[field_num - 1])
+        if len(fields) >= 4:
+            record_types[fields[3]] = record_types.get(fields[3], 0) + 1
+    return field_values, record_types
+
+def print_diff(zone, old_path, old, new_path, new):
+    field_values1, record_types1 = old
+    field_values2, record_types2 = new
+
+    print(f"\n[{time.strftime('%Y-%m-%d %H:%M:%S')}] Summary of changes for {zone}: {old_path} -> {new_path}\n")
+    for value in sorted(field_values2 - field_values1):
+        print(f"+{value}")
+    for value in sorted(field_values1 - field_values2):
+        print(f"-{value}")
+    for record_type in sorted(set(record_types1) | set(record_types2)):
+        count1, count2 = record_types1.get(record_type, 0), record_types2.get(record_type, 0)
+        if count1 != count2:
+            print(f"~{record_type}: {old_path}={count1}, {new_path}={count2}")
+
+def find_gz_files(directory):
+    gz_files = []
+    for root, _, files in os.walk(directory):
+        for file in files:
+            if file.endswith('.gz') and not file.startswith('.'):
+                gz_files.append(os.path.join(root, file))
+    return gz_files
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+class DropWatcher:
+    """ Keeps the parsed state of the latest drop of every zone and diffs each new drop against it. """
+
+    def __init__(self, field_num):
+        self.field_num = field_num
+        self.state = {}
+
+    def seed(self, directory):
+        # Warm the state with the newest existing drop of every zone
+        latest = {}
+        for path in find_gz_files(directory):
+            zone = zone_key(path)
+            if zone not in latest or os.path.getmtime(path) > os.path.getmtime(latest[zone]):
+                latest[zone] = path
+        for zone, path in sorted(latest.items()):
+            try:
+                signature = _signature(path)
+                self.state[zone] = (path, load_snapshot(path, self.field_num), signature)
+                print(f"Loaded {path} as the current snapshot of {zone}")
+            except (OSError, EOFError, zlib.error) as e:
+                print(f"Error: Could not read '{path}': {e}")
+
+    def process(self, path):
+        """ Diff a completed drop against the previous snapshot of its zone; False if it looks incomplete. """
+        signature = _signature(path)
+        if signature is None:
+            return True
+        zone = zone_key(path)
+        previous = self.state.get(zone)
+        # The snapshot is kept in memory, so the previous file may be gone by
+        # now; compare against the size and mtime it had when it was loaded
+        if previous and (previous[0], previous[2]) == (path, signature):
+            return True
+        if previous and signature[1] < previous[2][1]:
+            # An older drop of the zone than the current snapshot, e.g. one already there at startup
+            return True
+        try:
+            snapshot = load_snapshot(path, self.field_num)
+        except FileNotFoundError:
+            return True
+        except (EOFError, zlib.error):
+            return False
+
+        if previous:
+            print_diff(zone, previous[0], previous[1], path, snapshot)
+        else:
+            print(f"\n[{time.strftime('%Y-%m-%d %H:%M:%S')}] First snapshot of {zone}: {path}")
+        self.state[zone] = (path, snapshot, signature)
+        return True
+
+def _inotify_events(directory):
+    # Yields paths of files closed after writing or moved into the drop tree
+    libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    fd = libc.inotify_init1(IN_CLOEXEC)
+    if fd < 0:
+        raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    watches = {}
+    def add_watch(path):
+        wd = libc.inotify_add_watch(fd, os.fsencode(path), IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE)
+        if wd >= 0:
+            watches[wd] = path
+
+    for root, _, _ in os.walk(directory):
+        add_watch(root)
+
+    try:
+        while True:
+            buffer = os.read(fd, 65536)
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, _, length = struct.unpack_from('iIII', buffer, offset)
+                name = buffer[offset + 16:offset + 16 + length].rstrip(b'\0')
+                offset += 16 + length
+                if wd not in watches or not name:
+                    continue
+                path = os.path.join(watches[wd], os.fsdecode(name))
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        add_watch(path)
+                        # Files may have landed before the watch was in place
+                        yield from find_gz_files(path)
+                elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                    yield path
+    finally:
+        os.close(fd)
+
+def watch_inotify(directory, watcher):
+    for path in _inotify_events(directory):
+        if path.endswith('.gz') and not os.path.basename(path).startswith('.'):
+            if not watcher.process(path):
+                print(f"Error: '{path}' is truncated or corrupt.")
+
+def watch_polling(directory, watcher, interval):
+    # A file counts as complete once its size and mtime hold still for a whole
+    # interval. Files already there at startup may still be being written, so
+    # they go through the same check.
+    seen = {path: _signature(path) for path in find_gz_files(directory)}
+    while True:
+        time.sleep(interval)
+        ready = []
+        for path in find_gz_files(directory):
+            signature = _signature(path)
+            if signature is None:
+                continue
+            previous = seen.get(path)
+            if previous == ('done', signature):
+                continue
+            if previous == signature:
+                ready.append((signature[1], path))
+            else:
+                seen[path] = signature
+
+        # Oldest first, so several drops of one zone are diffed in order
+        for _, path in sorted(ready):
+            signature = seen[path]
+            seen[path] = ('done', signature)
+            # Report a bad file once; it is retried only when it changes again
+            if not watcher.process(path):
+                print(f"Error: '{path}' is truncated or corrupt.")
+
+def main():
+    parser = argparse.ArgumentParser(description='Watch a drop directory and diff each new gzipped zone file against the previous snapshot of its zone')
+    parser.add_argument('directory', help='Path to the drop directory')
+    parser.add_argument('-f', '--field', type=int, default=4, help='Field number to extract (default is 4)')
+    parser.add_argument('--poll', action='store_true', help='Poll the directory instead of using inotify')
+    parser.add_argument('--interval', type=float, default=5, help='Seconds between polls (default is 5)')
+    parser.add_argument('--no-seed', action='store_true', help='Do not load the newest existing drop of each zone at startup')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        print(f"Error: Directory '{args.directory}' not found.")
+        return
+
+    watcher = DropWatcher(args.field)
+    if not args.no_seed:
+        watcher.seed(args.directory)
+
+    try:
+        if not args.poll:
+            try:
+                watch_inotify(args.directory, watcher)
+            except (OSError, AttributeError) as e:
+                print(f"inotify unavailable ({e}), falling back to polling")
+        watch_polling(args.directory, watcher, args.interval)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
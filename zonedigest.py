@@ -0,0 +1,267 @@
+import argparse
+import bisect
+import gzip
+import hashlib
+import os
+
+import gzindex
+from zonereader import read_records
+
+# Average number of owners per leaf and of children per inner node
+FANOUT = 32
+DIGEST_SIZE = 16
+DIGEST_SUFFIX = '.zmd'
+HEADER = f"#zonedigest 1 fanout={FANOUT}"
+
+def _hash(data):
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE).digest()
+
+def _rank(owner):
+    # How many levels of the tree start a new node at this owner. It depends
+    # only on the name, so node boundaries line up between snapshots and an
+    # insertion or deletion only disturbs the nodes around it.
+    value = int.from_bytes(hashlib.blake2b(owner.encode('utf-8'), digest_size=8).digest(), 'little')
+    rank = 0
+    while value and value % FANOUT == 0:
+        rank += 1
+        value //= FANOUT
+    return rank
+
+class Node:
+    def __init__(self, start, digest, count, children=None):
+        self.start = start
+        self.digest = digest
+        self.count = count
+        # (first, last) child positions in the level below
+        self.children = children
+        self.end = None
+
+def owner_digests(filename):
+    """ Digest the RRsets of every owner; records are combined order-independently. """
+    sums = {}
+    for fields in read_records(filename):
+        if len(fields) < 4:
+            continue
+        owner = fields[0].lower()
+        canonical = ' '.join([owner, fields[1], fields[2].lower(), fields[3].lower()] + fields[4:])
+        sums[owner] = (sums.get(owner, 0) + int.from_bytes(_hash(canonical.encode('utf-8')), 'little')) % (1 << 128)
+    return sums
+
+def build_leaves(sums):
+    leaves = []
+    owners, digests = [], []
+    for owner in sorted(sums):
+        if owners and _rank(owner) >= 1:
+            leaves.append(Node(owners[0], _hash(b''.join(digests)), len(owners)))
+            owners, digests = [], []
+        owners.append(owner)
+        digests.append(owner.encode('utf-8') + b'\0' + sums[owner].to_bytes(DIGEST_SIZE, 'little'))
+    if owners:
+        leaves.append(Node(owners[0], _hash(b''.join(digests)), len(owners)))
+    return leaves
+
+def build_tree(leaves, height=None):
+    """ Build the levels above the leaves; returns levels[0] = leaves ... levels[-1] = [root]. """
+    _set_ends(leaves)
+    levels = [leaves]
+    extend_tree(levels, height)
+    return levels
+
+def extend_tree(levels, height=None):
+    """ Add levels on top of a built tree, single nodes above its root, until it has height levels. """
+    while len(levels[-1]) > 1 or (height and len(levels) < height):
+        below = levels[-1]
+        level = []
+        first = 0
+        for i in range(1, len(below) + 1):
+            if i == len(below) or _rank(below[i].start) >= len(levels) + 1:
+                children = below[first:i]
+                digest = _hash(b''.join(child.start.encode('utf-8') + b'\0' + child.digest for child in children))
+                level.append(Node(children[0].start, digest, sum(child.count for child in children), (first, i)))
+                first = i
+        _set_ends(level)
+        levels.append(level)
+
+def _set_ends(level):
+    for node, following in zip(level, level[1:]):
+        node.end = following.start
+
+def write_digest(filename, leaves):
+    with gzip.open(filename + DIGEST_SUFFIX, 'wt') as file:
+        file.write(HEADER + '\n')
+        for leaf in leaves:
+            file.write(f"{leaf.start}\t{leaf.count}\t{leaf.digest.hex()}\n")
+
+def read_digest(filename):
+    path = filename + DIGEST_SUFFIX
+    with gzip.open(path, 'rt') as file:
+        if file.readline().strip() != HEADER:
+            raise ValueError(f"'{path}' is not a zone digest")
+        leaves = []
+        for line in file:
+            start, count, digest = line.rstrip('\n').split('\t')
+            leaves.append(Node(start, bytes.fromhex(digest), int(count)))
+        return leaves
+
+def load_leaves(filename, rebuild=False):
+    # Use the stored digest unless it is missing or older than the snapshot
+    path = filename + DIGEST_SUFFIX
+    if not rebuild and os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(filename):
+        return read_digest(filename)
+    leaves = build_leaves(owner_digests(filename))
+    write_digest(filename, leaves)
+    return leaves
+
+def changed_ranges(leaves1, leaves2):
+    """ Compare two trees top down, descending only into differing subtrees.
+
+    Returns the merged owner ranges [start, end) that differ; end is None for
+    the end of the zone.
+    """
+    levels1, levels2 = build_tree(leaves1), build_tree(leaves2)
+    # Both trees are walked level by level, so the shorter one grows to the same height
+    height = max(len(levels1), len(levels2))
+    extend_tree(levels1, height)
+    extend_tree(levels2, height)
+
+    candidates1, candidates2 = list(levels1[-1]), list(levels2[-1])
+    for depth in range(height - 1, -1, -1):
+        same = {(node.start, node.end, node.digest) for node in candidates1} & \
+               {(node.start, node.end, node.digest) for node in candidates2}
+        dirty1 = [node for node in candidates1 if (node.start, node.end, node.digest) not in same]
+        dirty2 = [node for node in candidates2 if (node.start, node.end, node.digest) not in same]
+        if depth == 0:
+            break
+        candidates1 = [child for node in dirty1 for child in levels1[depth - 1][node.children[0]:node.children[1]]]
+        candidates2 = [child for node in dirty2 for child in levels2[depth - 1][node.children[0]:node.children[1]]]
+
+    ranges = []
+    for node in sorted(dirty1 + dirty2, key=lambda node: node.start):
+        if ranges and (ranges[-1][1] is None or node.start <= ranges[-1][1]):
+            if ranges[-1][1] is not None and (node.end is None or node.end > ranges[-1][1]):
+                ranges[-1][1] = node.end
+        else:
+            ranges.append([node.start, node.end])
+    return [tuple(r) for r in ranges]
+
+def _in_ranges(owner, starts, ranges):
+    i = bisect.bisect_right(starts, owner) - 1
+    return i >= 0 and (ranges[i][1] is None or owner < ranges[i][1])
+
+def _scan_ranges(filename, ranges):
+    # Without an index every line has to be inflated and checked
+    starts = [start for start, _ in ranges]
+    records = set()
+    for line, fields in read_records(filename, with_lines=True):
+        if _in_ranges(fields[0].lower(), starts, ranges):
+            records.add(line.rstrip())
+    return records
+
+def _seek_ranges(filename, ranges, points):
+    # Inflate from the last access point at or before each range start and
+    # stop at the end of the range; needs the zone sorted by owner name
+    # Returns None if the zone turns out not to be sorted
+    owners = [point.owner.lower() for point in points]
+    records = set()
+    for start, end in ranges:
+        first = 0
+        for i in range(bisect.bisect_left(owners, start) - 1, -1, -1):
+            if owners[i]:
+                first = i
+                break
+        previous = ''
+        for line in gzindex.read_lines(filename, points, first, len(points)):
+            if line.startswith(';'):
+                continue
+            fields = line.split()
+            if not fields:
+                continue
+            owner = fields[0].lower()
+            if owner < previous:
+                return None
+            previous = owner
+            if end is not None and owner >= end:
+                break
+            if owner >= start:
+                records.add(line.rstrip())
+    return records
+
+def _records_in_ranges(filename, ranges):
+    """ Collect the records whose owner falls in one of the ranges.
+
+    With an up to date gzindex sidecar and a zone sorted by owner name only
+    the changed ranges are inflated; otherwise the whole file is scanned.
+    """
+    try:
+        points, _ = gzindex.read_index(filename)
+    except (OSError, ValueError):
+        points = None
+    if points and all(a.owner.lower() <= b.owner.lower() for a, b in zip(points, points[1:]) if a.owner and b.owner):
+        records = _seek_ranges(filename, ranges, points)
+        if records is not None:
+            return records
+    return _scan_ranges(filename, ranges)
+
+def compare_digests(file1, file2, show_records=False, rebuild=False):
+    try:
+        leaves1 = load_leaves(file1, rebuild)
+        leaves2 = load_leaves(file2, rebuild)
+    except FileNotFoundError as e:
+        print(f"Error: File '{e.filename}' not found.")
+        return
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+
+    ranges = changed_ranges(leaves1, leaves2)
+    if not ranges:
+        print(f"\n{file1} and {file2} are identical.")
+        return
+
+    print(f"\nChanged owner ranges between {file1} and {file2}:\n")
+    for start, end in ranges:
+        print(f"{start} .. {end if end is not None else '(end of zone)'}")
+
+    if show_records:
+        # Only records inside the changed ranges are kept and diffed; with a
+        # gzindex sidecar only those ranges are inflated
+        lines1 = _records_in_ranges(file1, ranges)
+        lines2 = _records_in_ranges(file2, ranges)
+
+        print("\nAdded Records:\n")
+        for line in sorted(lines2 - lines1):
+            print(line)
+
+        print("\nDeleted Records:\n")
+        for line in sorted(lines1 - lines2):
+            print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and compare Merkle-tree digests of gzipped zone files')
+    parser.add_argument('files', nargs='+', help='Paths to the gzipped zone files')
+    parser.add_argument('--build', action='store_true', help='(Re)build the digest stored next to each file')
+    parser.add_argument('--compare', action='store_true', help='Compare the digests of two files and list the changed owner ranges')
+    parser.add_argument('--records', action='store_true', help='With --compare, also diff the records inside the changed ranges '
+                        '(for zones sorted by owner with a .gzidx index only those ranges are inflated, otherwise both files are scanned)')
+    args = parser.parse_args()
+
+    if args.compare:
+        if len(args.files) != 2:
+            print("Error: --compare takes exactly two files.")
+            return
+        compare_digests(args.files[0], args.files[1], args.records, args.build)
+    elif args.build:
+        for filename in args.files:
+            try:
+                leaves = load_leaves(filename, rebuild=True)
+            except FileNotFoundError:
+                print(f"Error: File '{filename}' not found.")
+                continue
+            root = build_tree(leaves)[-1][0].digest.hex() if leaves else '-'
+            print(f"{filename}: root {root} ({len(leaves)} leaves)")
+    else:
+        print("Error: You must specify an operation.")
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
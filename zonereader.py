@@ -0,0 +1,187 @@
+import os
+import queue
+import sys
+import threading
+import zlib
+
+# Size of the compressed blocks read from the file
+BLOCK_SIZE = 1 << 20
+# Most inflated bytes handed over at once
+INFLATE_SIZE = 1 << 17
+# Number of inflated blocks the reader thread may run ahead of the parser
+QUEUE_DEPTH = 16
+# Splitting and aggregating hold the GIL, so a reader thread only pays off
+# when zlib can run on another CPU at the same time
+THREADED = len(os.sched_getaffinity(0) if hasattr(os, 'sched_getaffinity') else range(os.cpu_count() or 1)) > 1
+
+_DONE = object()
+_prefetched = {}
+
+def _put(out_queue, item, stop):
+    # Block on a full queue, but give up once the consumer has gone away
+    while not stop.is_set():
+        try:
+            out_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def inflate_members(file, block_size=BLOCK_SIZE, max_length=INFLATE_SIZE):
+    """ Yield the inflated contents of a gzip file in pieces of at most max_length bytes.
+
+    Concatenated members are followed and zero padding after the last one is
+    ignored. Raises EOFError if the file ends inside a member and zlib.error
+    if a member is corrupt or fails its CRC or length check.
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    started = False
+    while True:
+        chunk = file.read(block_size)
+        if not chunk:
+            break
+        while chunk:
+            started = True
+            data = decompressor.decompress(chunk, max_length)
+            if data:
+                yield data
+            # At the end of a member the rest of the input shows up in both
+            # unused_data and unconsumed_tail, so eof has to be checked first
+            if decompressor.eof:
+                chunk = decompressor.unused_data
+                if not chunk.strip(b'\x00'):
+                    chunk = b''
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                started = False
+            else:
+                chunk = decompressor.unconsumed_tail
+    # Output zlib still holds back because of the size cap
+    while started and not decompressor.eof:
+        data = decompressor.decompress(b'', max_length)
+        if not data:
+            break
+        yield data
+    if started and not decompressor.eof:
+        raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+
+def _inflate_blocks(file, out_queue, stop):
+    # Reader thread: zlib releases the GIL while it works, so inflating
+    # overlaps with parsing on the consumer's thread
+    try:
+        with file:
+            for data in inflate_members(file):
+                if not _put(out_queue, data, stop):
+                    return
+        _put(out_queue, _DONE, stop)
+    except Exception as e:
+        _put(out_queue, e, stop)
+
+def _file_blocks(file):
+    with file:
+        yield from inflate_members(file)
+
+def _queued_blocks(blocks):
+    while True:
+        block = blocks.get()
+        if block is _DONE:
+            return
+        if isinstance(block, Exception):
+            raise block
+        yield block
+
+def _start(filename):
+    # Opening here keeps FileNotFoundError where callers already expect it
+    file = open(filename, 'rb')
+    if not THREADED:
+        return _file_blocks(file), None
+    stop = threading.Event()
+    blocks = queue.Queue(QUEUE_DEPTH)
+    threading.Thread(target=_inflate_blocks, args=(file, blocks, stop), daemon=True).start()
+    return _queued_blocks(blocks), stop
+
+def prefetch(filename):
+    """ Start inflating a file on a reader thread ahead of the read_records call that will consume it.
+
+    Does nothing when there is only one CPU to run the thread on.
+    """
+    if THREADED and filename not in _prefetched:
+        try:
+            _prefetched[filename] = _start(filename)
+        except OSError:
+            pass
+
+def cancel_prefetch(*filenames):
+    """ Stop the reader threads of prefetched files nobody read, closing their files.
+
+    Only the given files are cancelled, or every outstanding one when none are given.
+    """
+    for filename in filenames or list(_prefetched):
+        entry = _prefetched.pop(filename, None)
+        if entry:
+            entry[1].set()
+
+def read_records(filename, with_lines=False):
+    """ Yield the whitespace-split fields of each record in a gzipped zone file.
+
+    Comment and blank lines are skipped. With more than one CPU, inflating runs
+    on its own thread (zlib releases the GIL) and overlaps with splitting and
+    with whatever the caller does with each record. With with_lines=True,
+    (line, fields) pairs are yielded instead.
+    """
+    blocks, stop = _prefetched.pop(filename, None) or _start(filename)
+    try:
+        tail = b''
+        for block in blocks:
+            if tail:
+                block = tail + block
+            cut = block.rfind(b'\n') + 1
+            tail = block[cut:]
+            for line in block[:cut].decode('utf-8').split('\n'):
+                if line.startswith(';'):
+                    continue
+                fields = line.split()
+                if fields:
+                    yield (line, fields) if with_lines else fields
+        if tail:
+            line = tail.decode('utf-8')
+            fields = line.split()
+            if fields and not line.startswith(';'):
+                yield (line, fields) if with_lines else fields
+    finally:
+        blocks.close()
+        if stop:
+            stop.set()
+
+def _write_chunks(chunks, out, errors):
+    # Writer stage; keeps draining after a failed write so the producer never blocks
+    while True:
+        chunk = chunks.get()
+        if chunk is _DONE:
+            return
+        if not errors:
+            try:
+                out.write(chunk)
+            except Exception as e:
+                errors.append(e)
+
+def write_lines(lines, prefix=''):
+    """ Print lines through a writer thread so formatting overlaps with the writes to stdout. """
+    sys.stdout.flush()
+    chunks = queue.Queue(QUEUE_DEPTH)
+    errors = []
+    writer = threading.Thread(target=_write_chunks, args=(chunks, sys.stdout, errors), daemon=True)
+    writer.start()
+
+    buffer = []
+    for line in lines:
+        buffer.append(f"{prefix}{line}\n")
+        if len(buffer) >= 10000:
+            chunks.put(''.join(buffer))
+            buffer = []
+    if buffer:
+        chunks.put(''.join(buffer))
+    chunks.put(_DONE)
+    writer.join()
+    if errors:
+        raise errors[0]
+    sys.stdout.flush()